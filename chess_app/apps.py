@@ -1,6 +1,12 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class ChessConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'chess_app'
+
+    def ready(self):
+        if settings.CHESS_WARMUP_MODEL:
+            from .utils import model_registry
+            model_registry.warmup()
@@ -0,0 +1,604 @@
+import os
+import re
+import time
+import random
+import timeit
+import platform
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import chess
+import chess.polyglot
+import numpy as np
+from onnxruntime import InferenceSession
+from django.conf import settings
+from .engine import init_worker, split_search
+from .utils import minimax
+from .utils.book import book_move, build_book
+from .utils.config import ltr_to_num, num_to_ltr, piece_weights, position_weights
+from .utils.evaluation import evaluate_batch
+from .utils.functions import board_repr, calculate_score, get_game_state, move_gen
+from .utils.inference import predict_batch
+from .utils.model_registry import session_options
+from .utils.transposition import TranspositionTable
+
+POSITIONS_PATH = os.path.join(os.path.dirname(__file__), "benchmark_positions.epd")
+
+
+def legacy_get_mapping(board, piece):
+    s = str(board)
+    s = re.sub(f"[^{piece}{piece.upper()} \n]", ".", str(board))
+    s = re.sub(f"{piece}", "-1", s)
+    s = re.sub(f"{piece.upper()}", "1", s)
+    s = re.sub(r"\.", "0", s)
+
+    matrix = []
+    for row in s.split("\n"):
+        row = row.split(" ")
+        row = [int(x) for x in row]
+        matrix.append(row)
+    return matrix
+
+
+def legacy_board_repr(board):
+    """
+    The original string and regex based encoder, kept as the reference the
+    bitboard encoder is checked and timed against.
+    """
+    pieces = ["p", "r", "n", "b", "q", "k"]
+    layers = []
+    for piece in pieces:
+        layers.append(legacy_get_mapping(board, piece))
+    np_arr = np.array(layers, dtype=np.float32)
+    np_arr = np.expand_dims(np_arr, axis=0)
+    return np_arr
+
+
+def legacy_move_gen(pred, board):
+    # Initialize variables for the starting position
+    max_score = -1 * float("inf")
+    from_x, from_y = 0, 0
+
+    # Loop through all legal moves on the board
+    for move in board.legal_moves:
+        move = str(move)
+
+        # Extract row and column from the move string
+        row = 8 - int(move[1])
+        col = ltr_to_num[move[0]]
+
+        # Get the score from the prediction for the current move
+        cur_score = float(pred[0, row, col])
+
+        # Update the maximum score and corresponding position if the current score is higher
+        if cur_score > max_score:
+            max_score = cur_score
+            from_x = num_to_ltr[col]
+            from_y = 8 - row
+
+    # Build the starting position in chess notation (e.g., 'e2')
+    start = from_x + str(from_y)
+
+    # Reset max_score for the destination position
+    max_score = -1 * float("inf")
+    to_x, to_y = 0, 0
+
+    # Loop through all legal moves again
+    for move in board.legal_moves:
+        move = str(move)
+
+        # Check if the move starts from the previously determined starting position
+        if move[:2] == start:
+            # Extract row and column for the destination position
+            row = 8 - int(move[3])
+            col = ltr_to_num[move[2]]
+
+            # Get the score from the prediction for the current move
+            cur_score = float(pred[1, row, col])
+
+            # Update the maximum score and corresponding position if the current score is higher
+            if cur_score > max_score:
+                max_score = cur_score
+                to_x = num_to_ltr[col]
+                to_y = 8 - row
+
+    # Build the ending position in chess notation (e.g., 'e4')
+    end = to_x + str(to_y)
+
+    # Return the concatenated string representing the move (e.g., 'e2e4')
+    return start + end
+
+
+def legacy_predict_move(pred, board):
+    """
+    The original two-pass move selection including the promotion lookup done by
+    inference.predict, returning the move in UCI format.
+    """
+    move = legacy_move_gen(pred, board)
+    if move in get_game_state(board)["promotions"]:
+        move += 'q'
+    return move
+
+
+def legacy_get_pieces(board, color):
+    positions = board.piece_map()
+    white_positions = []
+    black_positions = []
+    for pos, piece in positions.items():
+        piece_str = str(piece)
+        if piece_str.isupper():
+            white_positions.append((piece_str.lower(), 63 - pos))
+        else:
+            black_positions.append((piece_str, pos))
+    if color == chess.WHITE:
+        return white_positions
+    return black_positions
+
+
+def legacy_calculate_score(board, color):
+    """
+    The original FEN counting and piece map based score, kept as the reference the
+    table based evaluation is checked and timed against.
+    """
+    board_fen = board.board_fen()
+    material_score = 0
+    for piece, weight in piece_weights.items():
+        if color == chess.WHITE:
+            piece = piece.upper()
+        material_score += board_fen.count(piece) * weight
+
+    board_pieces = legacy_get_pieces(board, color)
+    position_score = 0
+    for piece, pos in board_pieces:
+        position_score += position_weights[piece][pos]
+
+    check_score = 0
+    if color != board.turn:
+        if board.is_check():
+            check_score += 200
+        if board.is_checkmate():
+            check_score += 1500
+
+    return material_score + position_score + check_score
+
+
+def legacy_evaluate(board):
+    return legacy_calculate_score(board, board.turn) - legacy_calculate_score(board, not board.turn)
+
+
+def legacy_minimax(board, depth, is_ai):
+    """
+    The original full-width minimax with the AI playing black, kept as the reference
+    the alpha-beta search is checked against.
+    """
+    if depth == 0 or board.is_game_over():
+        chessai_score = legacy_calculate_score(board, chess.BLACK)
+        player1_score = legacy_calculate_score(board, chess.WHITE)
+        return None, chessai_score - player1_score
+
+    eval = -1*float('inf') if is_ai else float('inf')
+    best_move = None
+    for move in board.legal_moves:
+        board.push(move)
+        _, curr_eval = legacy_minimax(board, depth - 1, not is_ai)
+        board.pop()
+        if is_ai:
+            if curr_eval > eval:
+                eval = curr_eval
+                best_move = move
+        else:
+            if curr_eval < eval:
+                eval = curr_eval
+                best_move = move
+    return best_move, eval
+
+
+def random_positions(count, seed=0):
+    """
+    Generate reproducible positions by playing random games.
+
+    Parameters:
+    - count (int): The number of positions.
+    - seed (int): The random seed.
+
+    Returns:
+    list: A list of chess.Board objects that are not game over.
+    """
+    rng = random.Random(seed)
+    positions = []
+    while len(positions) < count:
+        board = chess.Board()
+        for _ in range(rng.randint(0, 80)):
+            moves = list(board.legal_moves)
+            if not moves:
+                break
+            board.push(rng.choice(moves))
+        if not board.is_game_over():
+            positions.append(chess.Board(board.fen()))
+    return positions
+
+
+def load_positions(path=POSITIONS_PATH):
+    """
+    Read the benchmark positions from an EPD file.
+
+    Parameters:
+    - path (str): The EPD file, one position per line.
+
+    Returns:
+    list: (id, chess.Board) tuples, the id being the EPD "id" operation or the line number.
+    """
+    positions = []
+    with open(path, encoding="utf-8") as epd_file:
+        for number, line in enumerate(epd_file, 1):
+            if line.strip() and not line.startswith("#"):
+                board, operations = chess.Board.from_epd(line)
+                positions.append((operations.get("id", str(number)), board))
+    return positions
+
+
+def proto_varint(value):
+    out = bytearray()
+    while value > 0x7F:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+def proto_field(number, value):
+    """
+    Encode one protobuf field, ints as varints and str/bytes as length-delimited.
+    """
+    if isinstance(value, int):
+        return proto_varint(number << 3) + proto_varint(value)
+    if isinstance(value, str):
+        value = value.encode()
+    return proto_varint(number << 3 | 2) + proto_varint(len(value)) + value
+
+
+def proto_value_info(name, shape):
+    # ValueInfoProto holding a float TypeProto.Tensor, str dims are symbolic
+    dims = b"".join(proto_field(1, proto_field(2, dim) if isinstance(dim, str) else proto_field(1, dim))
+                    for dim in shape)
+    tensor_type = proto_field(1, 1) + proto_field(2, dims)
+    return proto_field(1, name) + proto_field(2, proto_field(1, tensor_type))
+
+
+def proto_tensor(name, array):
+    # Float TensorProto with its data stored as raw little-endian bytes
+    dims = b"".join(proto_field(1, dim) for dim in array.shape)
+    return dims + proto_field(2, 1) + proto_field(8, name) + proto_field(9, array.astype("<f4").tobytes())
+
+
+def proto_ints_attribute(name, values):
+    return proto_field(1, name) + b"".join(proto_field(8, value) for value in values) + proto_field(20, 7)
+
+
+def stub_model(seed=0):
+    """
+    Build a stand-in for the chess model without the onnx package, by writing the
+    ONNX protobuf by hand.
+
+    The model is a single 3x3 convolution with random weights from the 6 piece planes
+    to the 2 from-square and to-square planes, so it has the input and output shapes
+    of the real model and the benchmarks can run offline.
+
+    Parameters:
+    - seed (int): The seed of the random weights.
+
+    Returns:
+    bytes: The serialized ONNX model.
+    """
+    rng = np.random.default_rng(seed)
+    weight = rng.standard_normal((2, 6, 3, 3), dtype=np.float32)
+    bias = np.zeros(2, dtype=np.float32)
+    node = (proto_field(1, "board") + proto_field(1, "weight") + proto_field(1, "bias")
+            + proto_field(2, "scores") + proto_field(4, "Conv")
+            + proto_field(5, proto_ints_attribute("kernel_shape", (3, 3)))
+            + proto_field(5, proto_ints_attribute("pads", (1, 1, 1, 1))))
+    graph = (proto_field(1, node) + proto_field(2, "stub")
+             + proto_field(5, proto_tensor("weight", weight)) + proto_field(5, proto_tensor("bias", bias))
+             + proto_field(11, proto_value_info("board", ("batch", 6, 8, 8)))
+             + proto_field(12, proto_value_info("scores", ("batch", 2, 8, 8))))
+    return (proto_field(1, 8) + proto_field(2, "chessbench") + proto_field(7, graph)
+            + proto_field(8, proto_field(2, 13)))
+
+
+def stub_session():
+    """
+    Load the stub model with the configured CHESS_SESSION_OPTIONS.
+    """
+    options = session_options(settings.CHESS_SESSION_OPTIONS)
+    return InferenceSession(stub_model(), sess_options=options, providers=["CPUExecutionProvider"])
+
+
+def per_call_us(func, cases, repeat=1, number=20):
+    """
+    Best of `repeat` runs of `number` passes over all argument tuples, in microseconds per call.
+    """
+    best = min(timeit.repeat(lambda: [func(*case) for case in cases], number=number, repeat=repeat))
+    return best / (number * len(cases)) * 1e6
+
+
+def compare(legacy, current, cases, number, repeat=1):
+    """
+    Time two implementations over the same argument tuples.
+
+    Returns:
+    dict: Microseconds per call for both implementations and the speedup.
+    """
+    legacy_us = per_call_us(legacy, cases, repeat, number)
+    current_us = per_call_us(current, cases, repeat, number)
+    return {"legacy_us": legacy_us, "current_us": current_us, "speedup": legacy_us / current_us}
+
+
+def bench_encode(positions, number=20, repeat=1):
+    """
+    Check that board_repr matches the legacy encoder bit for bit and time both.
+    """
+    for board in positions:
+        if not np.array_equal(board_repr(board), legacy_board_repr(board)):
+            raise AssertionError(f"board_repr differs from the legacy encoder: {board.fen()}")
+    buffer = np.empty((1, 6, 8, 8), dtype=np.float32)
+    return compare(legacy_board_repr, lambda board: board_repr(board, out=buffer),
+                   [(board,) for board in positions], number, repeat)
+
+
+def bench_move_gen(positions, number=20, repeat=1):
+    """
+    Check that move_gen selects the same move as the legacy two-pass loop on random
+    predictions and time both.
+    """
+    rng = np.random.default_rng(0)
+    cases = [(rng.standard_normal((2, 8, 8), dtype=np.float32), board) for board in positions]
+    for pred, board in cases:
+        if move_gen(pred, board).uci() != legacy_predict_move(pred, board):
+            raise AssertionError(f"move_gen differs from the legacy selection: {board.fen()}")
+    return compare(legacy_predict_move, move_gen, cases, number, repeat)
+
+
+def bench_evaluate(positions, number=20, repeat=1):
+    """
+    Check calculate_score and evaluate_batch against the legacy score and time the
+    legacy evaluation of every position against one evaluate_batch call for all of them,
+    and calculate_score on its own.
+    """
+    scores = evaluate_batch(positions)
+    for board, score in zip(positions, scores):
+        for color in chess.COLORS:
+            if calculate_score(board, color) != legacy_calculate_score(board, color):
+                raise AssertionError(f"calculate_score differs from the legacy score: {board.fen()}")
+        if score != legacy_evaluate(board):
+            raise AssertionError(f"evaluate_batch differs from the legacy score: {board.fen()}")
+    result = compare(lambda: [legacy_evaluate(board) for board in positions],
+                     lambda: evaluate_batch(positions), [()], number, repeat)
+    for key in ("legacy_us", "current_us"):
+        result[key] /= len(positions)
+    result["calculate_score_us"] = per_call_us(lambda board: calculate_score(board, board.turn),
+                                               [(board,) for board in positions], repeat, number)
+    return result
+
+
+def bench_book(positions, number=20, repeat=1, depth=3):
+    """
+    Time answering opening positions from a Polyglot book against searching them.
+
+    A temporary book is built from random games and its positions are answered both
+    by the book and by a fixed-depth minimax search on an empty transposition table,
+    the latency the book saves on every move while the game is in book.
+    """
+    rng = random.Random(0)
+    games, cases = [], []
+    for _ in range(max(1, len(positions) // 10)):
+        board = chess.Board()
+        for _ in range(10):
+            cases.append((board.copy(stack=False),))
+            board.push(rng.choice(list(board.legal_moves)))
+        games.append(board.move_stack)
+    cases = cases[:len(positions)]
+
+    handle, path = tempfile.mkstemp(suffix=".bin")
+    os.close(handle)
+    try:
+        build_book(games, path, plies=10)
+        with chess.polyglot.open_reader(path) as reader:
+            for (board,) in cases:
+                if book_move(board, reader) is None:
+                    raise AssertionError(f"Position missing from the book: {board.fen()}")
+            return compare(
+                lambda board: minimax.predict(board, depth, table=TranspositionTable(1)),
+                lambda board: book_move(board, reader),
+                cases, max(1, number // 10), repeat)
+    finally:
+        os.remove(path)
+
+
+def bench_quiescence(positions, number=20, repeat=1, depth=2):
+    """
+    Compare a plain search one ply deeper (legacy) with a search extended by the
+    quiescence stage (current), for node counts and time on empty transposition tables.
+    """
+    cases = [(board,) for board in positions[:max(1, len(positions) // 5)]]
+
+    def searcher(search_depth, quiescence):
+        def run(board):
+            search = minimax.Search(TranspositionTable(1), quiescence=quiescence)
+            search.search(board, search_depth)
+            return search.nodes
+        return run
+
+    legacy, current = searcher(depth + 1, False), searcher(depth, True)
+    result = compare(legacy, current, cases, 1, repeat)
+    result["legacy_nodes"] = sum(legacy(*case) for case in cases) // len(cases)
+    result["current_nodes"] = sum(current(*case) for case in cases) // len(cases)
+    return result
+
+
+def bench_inference(positions, number=20, repeat=1, session=None):
+    """
+    Time the chess model on one board, per board on all positions in one call, and a
+    whole chessai move (inference and move_gen).
+
+    Parameters:
+    - session (InferenceSession): The model to time, defaults to the stub model.
+    """
+    session = session or stub_session()
+    cases = [(board,) for board in positions]
+    return {
+        "single_us": per_call_us(lambda board: predict_batch([board], session), cases, repeat, number),
+        "batch_us": per_call_us(lambda: predict_batch(positions, session), [()], repeat, number)
+        / len(positions),
+        "chessai_move_us": per_call_us(
+            lambda board: move_gen(predict_batch([board], session)[0], board), cases, repeat, number),
+    }
+
+
+def time_to_depth(board, max_depth):
+    """
+    Deepen a minimax search one ply at a time like Search.iterate, without a time budget.
+
+    Returns:
+    tuple: The seconds elapsed when each depth was completed, nodes and quiescence nodes.
+    """
+    search = minimax.Search(TranspositionTable(settings.CHESS_TRANSPOSITION_TABLE_MB))
+    times = []
+    start = time.perf_counter()
+    for depth in range(1, max_depth + 1):
+        search.search(board, depth)
+        times.append(time.perf_counter() - start)
+        search.pv = search.principal_variation(board, depth)
+    return times, search.nodes, search.qnodes
+
+
+def bench_minimax(positions, number=20, repeat=1, depth=3):
+    """
+    Deepen a minimax search on every position to `depth`, keeping the best of `repeat`
+    runs, for the nodes per second and the mean time to complete each depth.
+    """
+    best = None
+    for _ in range(repeat):
+        totals, nodes, qnodes = [0] * depth, 0, 0
+        for board in positions:
+            times, board_nodes, board_qnodes = time_to_depth(board.copy(), depth)
+            totals = [total + seconds for total, seconds in zip(totals, times)]
+            nodes += board_nodes
+            qnodes += board_qnodes
+        if best is None or totals[-1] < best[0][-1]:
+            best = (totals, nodes, qnodes)
+    totals, nodes, qnodes = best
+    result = {"nodes": nodes, "qnodes": qnodes, "nps": nodes / totals[-1]}
+    for reached, total in enumerate(totals, 1):
+        result[f"depth_{reached}_ms"] = total / len(positions) * 1000
+    return result
+
+
+benchmarks = {
+    "encode": bench_encode,
+    "move_gen": bench_move_gen,
+    "evaluate": bench_evaluate,
+    "book": bench_book,
+    "quiescence": bench_quiescence,
+    "inference": bench_inference,
+    "minimax": bench_minimax,
+}
+
+
+def run_suite(positions, names=None, number=20, repeat=1, depth=3, session=None):
+    """
+    Run benchmarks on a fixed set of positions.
+
+    Parameters:
+    - positions (list): (id, chess.Board) tuples, see load_positions.
+    - names (list): The benchmarks to run, defaults to all of them.
+    - number (int): Passes over the positions per timing.
+    - repeat (int): Every timing is the best of this many runs.
+    - depth (int): The depth the minimax search is deepened to.
+    - session (InferenceSession): The model to time, defaults to the stub model.
+
+    Returns:
+    dict: The run configuration and the metrics of every benchmark. Metrics ending in
+          _us and _ms are times (lower is better), metrics ending in _nps are throughputs
+          (higher is better), the other metrics are counts and ratios.
+    """
+    boards = [board for _, board in positions]
+    options = {"inference": {"session": session}, "minimax": {"depth": depth}}
+    return {
+        "positions": [position_id for position_id, _ in positions],
+        "depth": depth,
+        "number": number,
+        "repeat": repeat,
+        "python": platform.python_version(),
+        "benchmarks": {name: benchmarks[name](boards, number, repeat, **options.get(name, {}))
+                       for name in names or benchmarks},
+    }
+
+
+def bench_scaling(boards, depth, max_workers):
+    """
+    Time the root-split search to a fixed depth on pools of 1 to `max_workers` processes.
+
+    Every pool is started and warmed up before it is timed, each position is searched
+    once per pool.
+
+    Returns:
+    list: One dict per pool size with the mean time per position, nodes searched, nodes
+          per second and the speedup over one process.
+    """
+    curve = []
+    for workers in range(1, max_workers + 1):
+        with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"),
+                                 initializer=init_worker) as pool:
+            list(pool.map(time.sleep, [0.5] * workers))
+            nodes = 0
+            start = time.perf_counter()
+            for board in boards:
+                nodes += split_search(pool, board, depth, workers)[3]
+            elapsed = time.perf_counter() - start
+        curve.append({
+            "workers": workers,
+            "time_ms": elapsed / len(boards) * 1000,
+            "nodes": nodes,
+            "nps": nodes / elapsed,
+            "speedup": curve[0]["time_ms"] / (elapsed / len(boards) * 1000) if curve else 1.0,
+        })
+    return curve
+
+
+def compare_results(current, baseline, threshold):
+    """
+    Find the metrics that got worse than a baseline run by more than a threshold.
+    The timings of the legacy implementations are not compared.
+
+    Parameters:
+    - current (dict): The result of run_suite.
+    - baseline (dict): An earlier result of run_suite.
+    - threshold (float): The allowed slowdown, e.g. 0.1 for 10%.
+
+    Returns:
+    tuple: (metric, baseline value, current value, slowdown) tuples for every compared
+           metric, named "benchmark.metric", and the list of the regressed metric names.
+
+    Raises:
+    ValueError: If the runs used different positions or depths.
+    """
+    if current["positions"] != baseline["positions"] or current["depth"] != baseline["depth"]:
+        raise ValueError("The baseline was run on other positions or to another depth")
+    changes, regressions = [], []
+    for benchmark, metrics in current["benchmarks"].items():
+        old_metrics = baseline["benchmarks"].get(benchmark, {})
+        for metric, value in metrics.items():
+            old = old_metrics.get(metric)
+            if old is None or not value or metric.startswith("legacy"):
+                continue
+            if metric.endswith("_nps") or metric == "nps":
+                slowdown = old / value - 1
+            elif metric.endswith(("_us", "_ms")):
+                slowdown = value / old - 1
+            else:
+                continue
+            name = f"{benchmark}.{metric}"
+            changes.append((name, old, value, slowdown))
+            if slowdown > threshold:
+                regressions.append(name)
+    return changes, regressions
@@ -0,0 +1,308 @@
+import os
+import time
+import asyncio
+import threading
+import multiprocessing
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import chess
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from .utils import instrumentation
+from .store import replay
+
+# Extra time a pool process gets past the search deadline before the request gives up.
+GRACE_SECONDS = 2
+
+_pool = None
+_pending = 0
+_lock = threading.Lock()
+
+
+class EngineBusy(Exception):
+    """
+    Raised when the engine can not take another move right now.
+    """
+
+
+def init_worker():
+    """
+    Prepare a pool process before its first move: set up Django and allocate the
+    transposition table. The model warmup in ChessConfig.ready() is turned off, since
+    'chessai' moves are predicted in the server process and never reach the pool.
+    """
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "website.settings")
+    os.environ["CHESS_WARMUP_MODEL"] = "false"
+    import django
+    django.setup()
+    from .utils import transposition
+    transposition.get_table()
+
+
+def run_job(root_fen, moves, predictor, deadline):
+    """
+    Choose the AI move inside a pool process.
+
+    Parameters:
+    - root_fen (str): The starting position of the game.
+    - moves (list): The moves played since, in UCI format, so the board keeps its history.
+    - predictor (str): The AI algorithm, see game.choose_move.
+    - deadline (float): The time.time() value at which the search returns its best move so far.
+
+    Returns:
+    tuple: The AI move in UCI format and the search info, see game.choose_move. When
+           CHESS_INSTRUMENTATION is enabled, the info holds the 'timings' of the process.
+    """
+    from .game import choose_move
+    recorder, token = instrumentation.start()
+    try:
+        with instrumentation.stage("replay"):
+            board = replay(root_fen, moves)
+        move, info = choose_move(board, predictor, deadline=deadline)
+    finally:
+        instrumentation.stop(token)
+    if recorder is not None:
+        info["timings"] = recorder.to_dict()
+    return move.uci(), info
+
+
+def run_split(root_fen, moves, depth, root_moves, deadline, pv):
+    """
+    Search some of the root moves inside a pool process, see split_search.
+
+    Parameters:
+    - root_fen (str): The starting position of the game.
+    - moves (list): The moves played since, in UCI format.
+    - depth (int): The search depth.
+    - root_moves (list): The root moves to search, in UCI format and generation order.
+    - deadline (float): The time.time() value at which the search returns its best move so far.
+    - pv (list): The principal variation of the previous depth, in UCI format, searched first.
+
+    Returns:
+    tuple: The best of the root moves (UCI), its score, its principal variation, the
+           nodes searched and whether the deadline passed.
+    """
+    from .utils import minimax, transposition
+    board = replay(root_fen, moves)
+    search = minimax.Search(transposition.get_table(), deadline)
+    search.pv = [chess.Move.from_uci(move) for move in pv]
+    move, score = search.search(board, depth, [chess.Move.from_uci(move) for move in root_moves])
+    line = [] if search.timed_out else [move.uci() for move in search.principal_variation(board, depth)]
+    return move.uci(), score, line, search.nodes, search.timed_out
+
+
+def submit_split(pool, board, depth, moves, parts, deadline=None, pv=()):
+    """
+    Deal the root moves round-robin over `parts` jobs, each keeping the generation
+    order of its moves, and submit them to a pool.
+
+    Returns:
+    list: The futures of the run_split jobs.
+    """
+    root_fen = board.root().fen()
+    stack = [move.uci() for move in board.move_stack]
+    return [pool.submit(run_split, root_fen, stack, depth, [move.uci() for move in moves[i::parts]],
+                        deadline, list(pv))
+            for i in range(min(parts, len(moves)))]
+
+
+def merge_split(results, moves):
+    """
+    Merge the results of run_split jobs: the highest score wins and equal scores go to
+    the move generated first, like the single-process search, whatever order the jobs
+    finished in.
+
+    Returns:
+    tuple: The best move (UCI), its score and principal variation, the total nodes
+           searched and whether any job hit the deadline.
+    """
+    index = {move.uci(): i for i, move in enumerate(moves)}
+    move, score, line, _, _ = max(results, key=lambda result: (result[1], -index[result[0]]))
+    return (move, score, line, sum(result[3] for result in results),
+            any(result[4] for result in results))
+
+
+def split_search(pool, board, depth, parts, deadline=None):
+    """
+    Search a position to a fixed depth with its root moves split over a pool.
+
+    Returns:
+    tuple: See merge_split.
+    """
+    moves = list(board.generate_legal_moves())
+    futures = submit_split(pool, board, depth, moves, parts, deadline)
+    return merge_split([future.result() for future in futures], moves)
+
+
+async def split_think(board, budget_ms, deadline):
+    """
+    Iterative deepening with every depth split over all processes of the engine pool.
+
+    Every depth waits for all jobs, the next depth is only started while less than half
+    of the budget is used. If the deadline hits during a depth, the previous depth's
+    move is kept.
+
+    Returns:
+    tuple: The AI move (chess.Move) and the search info, see minimax.think.
+    """
+    config = settings.CHESS_ENGINE
+    pool = get_pool()
+    moves = list(board.generate_legal_moves())
+    start = time.time()
+    budget = budget_ms / 1000
+    deadline = min(deadline, start + budget)
+    best, pv, reached, nodes = None, [], 0, 0
+    for depth in range(1, settings.CHESS_MAX_SEARCH_DEPTH + 1):
+        futures = submit_split(pool, board, depth, moves, config["workers"], deadline, pv)
+        results = await asyncio.wait_for(
+            asyncio.gather(*(asyncio.wrap_future(future) for future in futures)),
+            deadline - time.time() + GRACE_SECONDS)
+        move, score, line, depth_nodes, timed_out = merge_split(results, moves)
+        nodes += depth_nodes
+        if timed_out:
+            if best is None:
+                best, pv = (move, score), [move]
+            break
+        best, pv, reached = (move, score), line, depth
+        if time.time() - start > budget / 2:
+            break
+    elapsed = time.time() - start
+    instrumentation.count("nodes", nodes)
+    info = {
+        "depth": reached,
+        "partial": False,
+        "nodes": nodes,
+        "nps": int(nodes / elapsed) if elapsed else 0,
+        "time_ms": int(elapsed * 1000),
+        "score": best[1],
+        "pv": pv,
+        "workers": config["workers"],
+    }
+    return chess.Move.from_uci(best[0]), info
+
+
+def get_pool():
+    """
+    Get the process pool of this worker, created on first use with CHESS_ENGINE['workers']
+    processes. A new pool starts all its processes right away, so they run init_worker
+    while no move is waiting for them.
+
+    Returns:
+    ProcessPoolExecutor: The pool.
+    """
+    global _pool
+    if _pool is None:
+        with _lock:
+            if _pool is None:
+                workers = settings.CHESS_ENGINE["workers"]
+                _pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"),
+                                            initializer=init_worker)
+                # The pool spawns a process per job while none is idle
+                for _ in range(workers):
+                    _pool.submit(os.getpid)
+    return _pool
+
+
+def start_pool():
+    """
+    Start the engine processes when the server starts instead of on the first move,
+    see get_pool. Does nothing when CHESS_ENGINE['workers'] is 0.
+    """
+    if settings.CHESS_ENGINE["workers"]:
+        get_pool()
+
+
+def discard_pool():
+    """
+    Shut down a broken pool, the next move starts a new one.
+    """
+    global _pool
+    with _lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+@contextmanager
+def engine_slot(slots=1):
+    """
+    Count a move in progress, refusing it when CHESS_ENGINE['queue_limit'] slots are
+    already taken by moves being searched or waiting for a pool process.
+
+    Parameters:
+    - slots (int): The slots the move takes, one per pool process it keeps busy.
+
+    Raises:
+    EngineBusy: If the queue is full.
+    """
+    global _pending
+    with _lock:
+        if _pending + slots > settings.CHESS_ENGINE["queue_limit"]:
+            raise EngineBusy()
+        _pending += slots
+    try:
+        yield
+    finally:
+        with _lock:
+            _pending -= slots
+
+
+async def choose_split_move(board, predictor, deadline):
+    """
+    Choose a minimax move with split_think, after the mate in one and opening book
+    checks, which are quick enough to run here.
+    """
+    from .game import forced_move
+    move, info = forced_move(board, list(board.legal_moves))
+    if move is None:
+        with instrumentation.stage("search"):
+            move, info = await split_think(board, settings.CHESS_SEARCH_BUDGETS[predictor], deadline)
+        info["predictor"] = predictor
+    return move, info
+
+
+async def choose_move(board, predictor, parallel=False):
+    """
+    Choose the AI move without blocking the event loop.
+
+    The move is searched in the process pool, or in a thread when CHESS_ENGINE['workers']
+    is 0. The minimax search stops at CHESS_ENGINE['deadline_ms'] with the best move found
+    so far. 'chessai' moves are always predicted in a thread of this process, where the
+    micro-batcher (CHESS_BATCH_WINDOW_MS) merges concurrent requests into one model call.
+
+    Parameters:
+    - board (chess.Board): The board with its move history, the AI is the side to move.
+    - predictor (str): The AI algorithm, see game.choose_move.
+    - parallel (bool): Split the root moves of a minimax search over all pool processes
+      instead of searching them in one, when the pool has more than one process. The
+      split search takes one engine slot per process.
+
+    Returns:
+    tuple: The AI move (chess.Move) and the search info, see game.choose_move.
+
+    Raises:
+    EngineBusy: If the engine queue is full, the pool failed or the move took too long.
+    """
+    config = settings.CHESS_ENGINE
+    budget = config["deadline_ms"] / 1000
+    deadline = time.time() + budget
+    split = parallel and config["workers"] > 1 and predictor in settings.CHESS_SEARCH_BUDGETS
+    with engine_slot(min(config["workers"], config["queue_limit"]) if split else 1):
+        if not config["workers"] or predictor == 'chessai':
+            from .game import choose_move as choose_move_sync
+            return await sync_to_async(choose_move_sync, thread_sensitive=False)(
+                board, predictor, deadline=deadline)
+        moves = [move.uci() for move in board.move_stack]
+        try:
+            if split:
+                return await choose_split_move(board, predictor, deadline)
+            future = get_pool().submit(run_job, board.root().fen(), moves, predictor, deadline)
+            uci, info = await asyncio.wait_for(asyncio.wrap_future(future), budget + GRACE_SECONDS)
+        except BrokenProcessPool as error:
+            discard_pool()
+            raise EngineBusy() from error
+        except asyncio.TimeoutError as error:
+            raise EngineBusy() from error
+        instrumentation.merge(info.pop("timings", None))
+        return chess.Move.from_uci(uci), info
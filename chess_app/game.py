@@ -1,35 +1,109 @@
 import chess
 import random
+from django.conf import settings
 from .utils import minimax
 from .utils import inference
 from .utils.functions import get_game_state
+from .utils.tactics import find_mate_in_one
+from .utils.book import book_move
+from .utils import instrumentation
+from . import engine
 
-def play(player1_move, board, predictor):
+def forced_move(board, legal_moves):
+   '''
+    Checks for a mate in one and then the opening book, which are played whatever the
+    predictor.
+
+    Parameters:
+    - board: The chess board representing the current state of the game.
+    - legal_moves (list): The legal moves of the board.
+
+    Returns:
+    tuple: The move (chess.Move) and a dict describing how it was found, or (None, None).
+   '''
+   with instrumentation.stage("mate"):
+      move = find_mate_in_one(board, legal_moves)
+   if move is not None:
+      instrumentation.count("mate_hits")
+      return move, {"predictor": "mate"}
+   with instrumentation.stage("book"):
+      move = book_move(board)
+   if move is not None:
+      instrumentation.count("book_hits")
+      return move, {"predictor": "book"}
+   return None, None
+
+def choose_move(board, predictor, deadline=None, legal_moves=None):
+   '''
+    Chooses the AI move for the side to move, checking for a mate in one and then
+    the opening book before asking the predictor.
+
+    Parameters:
+    - board: The chess board representing the current state of the game.
+    - predictor: The AI algorithm used for predicting the AI's move. Options: the minimax
+      presets in CHESS_SEARCH_BUDGETS (e.g. 'minimax'), 'chessai', 'random'.
+    - deadline (float): Optional time.time() value after which the minimax search returns
+      the best move found so far.
+    - legal_moves (list): The legal moves of the board, generated if not given.
+
+    Returns:
+    tuple: The AI move (chess.Move) and a dict describing how it was found. For minimax it
+           holds the depth reached, nodes searched, nodes per second, time used and the
+           transposition table stats.
+   '''
+   if legal_moves is None:
+      legal_moves = list(board.legal_moves)
+   move, info = forced_move(board, legal_moves)
+   if move is not None:
+      return move, info
+   budgets = settings.CHESS_SEARCH_BUDGETS
+   if predictor in budgets:
+      move, info = minimax.think(board, budgets[predictor], settings.CHESS_MAX_SEARCH_DEPTH,
+                                 moves=legal_moves, deadline=deadline)
+   elif predictor == 'chessai':
+      move, info = inference.predict(board, legal_moves), {}
+   else:
+      move, info = random.choice(legal_moves), {}
+   info["predictor"] = predictor
+   return move, info
+
+async def play_async(player1_move, board, predictor, compact=False, parallel=False):
    '''
     Simulates the next move in the chess game, where the player makes a move,
     and the AI responds with its move. Returns the updated game state.
 
+    The AI move is chosen by the engine process pool so the caller's event loop is not
+    blocked. If choosing the AI move fails or is cancelled, EngineBusy included, the
+    player's move is taken back before the error is raised, so the board is never left
+    with the AI to move.
+
     Parameters:
     - player1_move (str): The move made by the human player in Universal Chess Interface (UCI) format.
-    - board: The chess board representing the current state of the game.
-    - predictor: The AI algorithm used for predicting the AI's move. Options: 'minimax', 'random'.
+    - board: The chess board representing the current state of the game, with its move history.
+    - predictor: The AI algorithm used for predicting the AI's move. Options: 'minimax', 'chessai', 'random'.
+    - compact (bool): Send the legal moves packed, see get_game_state.
+    - parallel (bool): Split the minimax search over the engine pool, see engine.choose_move.
 
     Returns:
     dict: A dictionary containing information about the updated game state,
          including legal moves, promotions, current board position in Forsyth-Edwards Notation (FEN),
-         game over status, and check status.
+         game over status, check status and how the AI move was found.
    '''
-   
-   board.push(chess.Move.from_uci(player1_move))
-   if board.legal_moves:
-      copy_board = chess.Board(board.fen())
-      if predictor == 'minimax':
-         move, _ = minimax.predict(copy_board, depth=2, is_ai=True)
-      elif predictor == 'chessai':
-         move = inference.predict(copy_board)
-      else:
-         move = random.choice(list(board.legal_moves))
+   with instrumentation.stage("push"):
+      board.push(chess.Move.from_uci(player1_move))
+      legal_moves = list(board.legal_moves)
+   info = None
+   if legal_moves:
+      try:
+         with instrumentation.stage("engine"):
+            move, info = await engine.choose_move(board, predictor, parallel)
+      except BaseException:
+         board.pop()
+         raise
       board.push(move)
+      legal_moves = None
 
-   game_state = get_game_state(board)
+   with instrumentation.stage("state"):
+      game_state = get_game_state(board, legal_moves, compact)
+   game_state['engine'] = info
    return game_state
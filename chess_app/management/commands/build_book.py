@@ -0,0 +1,42 @@
+"""
+Builds the Polyglot opening book used in front of the chess predictors.
+"""
+import chess.pgn
+from django.core.management.base import BaseCommand, CommandError
+from chess_app.utils.book import build_book
+
+
+def read_games(pgn_path):
+    """
+    Yield the main line of every standard game in a PGN file.
+    """
+    with open(pgn_path, encoding="utf-8", errors="replace") as pgn_file:
+        while True:
+            game = chess.pgn.read_game(pgn_file)
+            if game is None:
+                return
+            if game.board() == chess.Board() and not game.errors:
+                yield list(game.mainline_moves())
+
+
+class Command(BaseCommand):
+    """
+    Build an opening book, e.g. `python manage.py build_book games.pgn book.bin`.
+    """
+    help = "Build a Polyglot opening book from a local PGN file."
+
+    def add_arguments(self, parser):
+        parser.add_argument("pgn", help="The PGN file to read.")
+        parser.add_argument("output", help="The .bin book to write, see CHESS_BOOK_PATH.")
+        parser.add_argument("--plies", type=int, default=20,
+                            help="How many half-moves of every game go into the book.")
+        parser.add_argument("--min-count", type=int, default=2,
+                            help="Leave out moves played fewer times than this.")
+
+    def handle(self, *args, **options):
+        try:
+            count = build_book(read_games(options["pgn"]), options["output"],
+                               options["plies"], options["min_count"])
+        except OSError as error:
+            raise CommandError(error) from error
+        self.stdout.write(f"Wrote {count} entries to {options['output']}")
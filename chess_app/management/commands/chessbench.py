@@ -0,0 +1,94 @@
+"""
+Benchmarks for the chess engine.
+"""
+import json
+from django.core.management.base import BaseCommand, CommandError
+from chess_app.benchmarks import (POSITIONS_PATH, bench_scaling, benchmarks, compare_results,
+                                  load_positions, random_positions, run_suite)
+from chess_app.utils.model_registry import get_session
+
+
+class Command(BaseCommand):
+    """
+    Run the chess benchmarks, e.g. `python manage.py chessbench encode`. With --output
+    or --json the results are written as JSON, e.g. `python manage.py chessbench
+    --output baseline.json` and later `python manage.py chessbench --compare baseline.json`.
+    """
+    help = ("Check optimized chess helpers against their legacy versions and measure encode, "
+            "inference and minimax throughput.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("names", nargs="*", help=f"Benchmarks to run: {', '.join(benchmarks)}")
+        parser.add_argument("--epd", default=POSITIONS_PATH, help="EPD file of test positions.")
+        parser.add_argument("--positions", type=int,
+                            help="Use this many random positions instead of the EPD file.")
+        parser.add_argument("--seed", type=int, default=0, help="Seed of the random positions.")
+        parser.add_argument("--number", type=int, default=20, help="Passes over the positions per timing.")
+        parser.add_argument("--repeat", type=int, default=3, help="Keep the best of this many runs.")
+        parser.add_argument("--depth", type=int, default=3, help="Depth of the minimax time-to-depth runs.")
+        parser.add_argument("--model", action="store_true",
+                            help="Time CHESS_MODEL_PATH instead of the generated stub model.")
+        parser.add_argument("--scaling", type=int, default=0, metavar="N",
+                            help="Also time the root-split search on 1 to N processes.")
+        parser.add_argument("--json", action="store_true", help="Write the results to stdout as JSON.")
+        parser.add_argument("--output", help="Write the JSON results to this file.")
+        parser.add_argument("--compare", help="JSON results of a baseline run to compare against.")
+        parser.add_argument("--threshold", type=float, default=0.1,
+                            help="Fail when a metric is this much slower than the baseline (0.1 = 10%%).")
+
+    def handle(self, *args, **options):
+        names = options["names"] or list(benchmarks)
+        unknown = set(names) - set(benchmarks)
+        if unknown:
+            raise CommandError(f"Unknown benchmarks: {', '.join(sorted(unknown))}")
+        try:
+            if options["positions"]:
+                boards = random_positions(options["positions"], options["seed"])
+                positions = [(f"random {options['seed']} {number}", board)
+                             for number, board in enumerate(boards, 1)]
+            else:
+                positions = load_positions(options["epd"])
+            session = get_session() if options["model"] else None
+        except (OSError, ValueError) as error:
+            raise CommandError(error) from error
+        result = run_suite(positions, names, options["number"], options["repeat"], options["depth"],
+                           session)
+        if options["scaling"]:
+            result["scaling"] = bench_scaling([board for _, board in positions], options["depth"],
+                                              options["scaling"])
+
+        if options["json"]:
+            self.stdout.write(json.dumps(result, indent=2))
+        else:
+            self.write_summary(result)
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as output_file:
+                output_file.write(json.dumps(result, indent=2) + "\n")
+
+        if options["compare"]:
+            try:
+                with open(options["compare"], encoding="utf-8") as baseline_file:
+                    baseline = json.load(baseline_file)
+                changes, regressions = compare_results(result, baseline, options["threshold"])
+            except (OSError, ValueError, KeyError) as error:
+                raise CommandError(error) from error
+            for name, old, value, slowdown in changes:
+                self.stderr.write(f"{name}: {old:.1f} -> {value:.1f}, slowdown {slowdown:+.1%}")
+            if regressions:
+                raise CommandError(f"Regressed beyond {options['threshold']:.0%}: {', '.join(regressions)}")
+
+    def write_summary(self, result):
+        for name, metrics in result["benchmarks"].items():
+            if "speedup" in metrics:
+                self.stdout.write(
+                    f"{name}: legacy {metrics['legacy_us']:.1f}us, "
+                    f"current {metrics['current_us']:.1f}us, {metrics['speedup']:.1f}x faster")
+            else:
+                self.stdout.write(f"{name}: " + ", ".join(f"{metric} {value:.1f}"
+                                                         for metric, value in metrics.items()))
+            if "legacy_nodes" in metrics:
+                self.stdout.write(f"  nodes per position: legacy {metrics['legacy_nodes']}, "
+                                  f"current {metrics['current_nodes']}")
+        for point in result.get("scaling", []):
+            self.stdout.write(f"scaling: {point['workers']} workers, {point['time_ms']:.1f}ms, "
+                              f"{point['speedup']:.2f}x")
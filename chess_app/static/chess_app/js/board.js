@@ -22,17 +22,64 @@ function pieceTheme(piece) {
   return pieces[piece]
 }
 
+/**
+ * Reads a cookie, used for the CSRF token since the page itself is cached.
+ *
+ * @param {string} name - The name of the cookie.
+ * @returns {string} - The decoded value of the cookie, or null if it is not set.
+ */
+function getCookie(name) {
+  for (const cookie of document.cookie.split(";")) {
+    const [key, ...value] = cookie.trim().split("=");
+    if (key === name) {
+      return decodeURIComponent(value.join("="));
+    }
+  }
+  return null;
+}
+
+/**
+ * Unpacks the legal moves sent in the compact format: base64 encoded little-endian
+ * uint16 values with the from-square in bits 0-5, the to-square in bits 6-11 and
+ * bit 12 set for promotions. Squares are numbered a1 = 0 to h8 = 63.
+ *
+ * @param {string} packed - The packed moves.
+ * @returns {object} - The legal moves and promotions as arrays of "e2e4" strings.
+ */
+function unpackMoves(packed) {
+  const bytes = atob(packed);
+  const files = "abcdefgh";
+  let square = (index) => files[index & 7] + ((index >> 3) + 1);
+  let moves = { legal_moves: [], promotions: [] };
+  for (let i = 0; i < bytes.length; i += 2) {
+    let value = bytes.charCodeAt(i) | (bytes.charCodeAt(i + 1) << 8);
+    let move = square(value & 63) + square((value >> 6) & 63);
+    moves.legal_moves.push(move);
+    if (value & 4096) {
+      moves.promotions.push(move);
+    }
+  }
+  return moves;
+}
+
 /**
  * Updates the game interface based on the provided JSON data.
  *
  * @param {object} json_data - The JSON data containing information about the game state.
  */
 function updateGame(json_data) {
-  legal_moves = json_data["legal_moves"].split(",");
-  promotions = json_data["promotions"].split(",");
+  if ("moves" in json_data) {
+    ({ legal_moves, promotions } = unpackMoves(json_data["moves"]));
+  } else {
+    legal_moves = json_data["legal_moves"].split(",");
+    promotions = json_data["promotions"].split(",");
+  }
   curr_board = json_data["curr_board"];
   is_game_over = json_data["is_game_over"];
   is_check = json_data["is_check"];
+  game_id = json_data["game_id"];
+  document.getElementById("undo-btn").disabled = !json_data["can_undo"];
+  document.getElementById("redo-btn").disabled = !json_data["can_redo"];
 
   let status = document.getElementById("status");
   if (is_game_over || legal_moves.length === 0) {
@@ -47,14 +94,41 @@ function updateGame(json_data) {
   }
 }
 
+/**
+ * Shows why the server refused a request and puts the board back.
+ *
+ * @param {string} message - The error sent by the server.
+ */
+function showError(message) {
+  let error = document.createElement("span");
+  error.className = "bg-danger pb-1 px-2 rounded";
+  error.textContent = message || "Something went wrong, try again.";
+  document.getElementById("status").replaceChildren(error);
+  board.position(curr_board);
+  isMoveComplete = true;
+}
+
 /**
  * Sends an XMLHttpRequest to a specified URL and updates the game based on the response.
+ * The shown position is only sent when there is no game yet, or once more after the
+ * server answered that the game expired, so it can continue from there.
  *
  * @param {string} url - The URL to send the request to.
+ * @param {string} move - The move of the player in UCI format, or null.
+ * @param {boolean} resend - Whether to send the shown position along.
  */
-function hitURL(url, move) {
+function hitURL(url, move, resend = false) {
   const xhttp = new XMLHttpRequest();
   xhttp.onload = function () {
+    if (this.status === 404 && !resend) {
+      hitURL(url, move, true);
+      return;
+    }
+    if (this.status !== 200) {
+      let isJson = this.getResponseHeader("Content-Type") === "application/json";
+      showError(isJson ? JSON.parse(this.responseText)["error"] : null);
+      return;
+    }
     let json_data = JSON.parse(this.responseText);
     updateGame(json_data);
     setTimeout(() => {
@@ -64,10 +138,15 @@ function hitURL(url, move) {
   };
   isMoveComplete = false;
   let model = document.querySelector('input[name="model"]:checked').value;
+  let parallel = document.getElementById("parallel").checked;
   xhttp.open("POST", url, true);
   xhttp.setRequestHeader("Content-Type", "application/json");
   xhttp.setRequestHeader("X-CSRFToken", csrf_token);
-  xhttp.send(JSON.stringify({ curr_board, move, model }));
+  let data = { game_id, move, model, parallel, compact: true };
+  if (!game_id || resend) {
+    data.curr_board = curr_board;
+  }
+  xhttp.send(JSON.stringify(data));
 }
 
 /**
@@ -93,8 +172,6 @@ function onDrop(source, target) {
 
   if (isMoveComplete) {
     hitURL(game_url, move);
-    var button = document.getElementById("undo-btn");
-    button.disabled = false;
   } else {
     return "snapback";
   }
@@ -106,16 +183,24 @@ function onDrop(source, target) {
 function resetGame() {
   if (isMoveComplete) {
     hitURL(reset_url, null);
-    var button = document.getElementById("undo-btn");
-    button.disabled = false;
   }
 }
 
+/**
+ * Takes back the last move of the player and the reply of the AI.
+ */
 function undoMove() {
   if (isMoveComplete) {
     hitURL(undo_move, null);
-    var button = document.getElementById("undo-btn");
-    button.disabled = true;
+  }
+}
+
+/**
+ * Replays the moves taken back by the last undo.
+ */
+function redoMove() {
+  if (isMoveComplete) {
+    hitURL(redo_move, null);
   }
 }
 
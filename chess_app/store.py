@@ -0,0 +1,220 @@
+import uuid
+import threading
+from collections import OrderedDict
+import chess
+from django.conf import settings
+from django.core.cache import caches
+
+_store = None
+_lock = threading.Lock()
+
+
+def replay(root_fen, moves):
+    """
+    Rebuild a board with its history from the starting position and the UCI moves since.
+    """
+    board = chess.Board(root_fen)
+    for move in moves:
+        board.push_uci(move)
+    return board
+
+
+class Game:
+    """
+    A game in progress.
+
+    Attributes:
+        id (str): The game id sent to the client.
+        board (chess.Board): The live board, including its move stack.
+        human (chess.Color): The color of the human player, the side to move when the game started.
+        redo_stack (list): Moves taken back by undo, the next move to redo last.
+        discarded (chess.Board): The board replaced by the last reset, restored by undo.
+        version (str): Changes on every save, used to detect copies updated by another worker.
+        lock (threading.Lock): Serializes changes to this game. It is only ever acquired
+            without blocking, a request that finds it held answers 409.
+    """
+
+    def __init__(self, game_id, board, version=None, human=None):
+        self.id = game_id
+        self.board = board
+        self.human = board.root().turn if human is None else human
+        self.redo_stack = []
+        self.discarded = None
+        self.version = version or uuid.uuid4().hex
+        self.lock = threading.Lock()
+
+    def reset(self):
+        """
+        Start over from the standard starting position, keeping the old board for undo.
+        """
+        self.discarded = self.board
+        self.board = chess.Board()
+        self.human = chess.WHITE
+        self.redo_stack.clear()
+
+    def undo(self, plies=None):
+        """
+        Take back moves from the move stack.
+
+        Parameters:
+        - plies (int): The number of half-moves to take back. By default moves are taken
+          back until it is the human player's turn again, normally the human move and
+          the AI reply. Undoing a freshly reset game restores the game before the reset.
+        """
+        board = self.board
+        if not board.move_stack:
+            if self.discarded is not None:
+                self.board, self.discarded = self.discarded, None
+                self.human = self.board.root().turn
+                self.redo_stack.clear()
+            return
+        if plies is None:
+            self.redo_stack.append(board.pop())
+            while board.move_stack and board.turn != self.human:
+                self.redo_stack.append(board.pop())
+            return
+        for _ in range(min(plies, len(board.move_stack))):
+            self.redo_stack.append(board.pop())
+
+    def redo(self, plies=None):
+        """
+        Replay moves taken back by undo.
+
+        Parameters:
+        - plies (int): The number of half-moves to replay. By default moves are replayed
+          until it is the human player's turn again.
+        """
+        board = self.board
+        if plies is None:
+            if self.redo_stack:
+                board.push(self.redo_stack.pop())
+            while self.redo_stack and board.turn != self.human:
+                board.push(self.redo_stack.pop())
+            return
+        for _ in range(min(plies, len(self.redo_stack))):
+            board.push(self.redo_stack.pop())
+
+    def go_to(self, ply):
+        """
+        Move to a ply of the game, 0 being the starting position, by undoing or redoing.
+        """
+        current = len(self.board.move_stack)
+        if ply < current:
+            self.undo(current - ply)
+        elif ply > current:
+            self.redo(ply - current)
+
+    def to_dict(self):
+        discarded = self.discarded
+        return {
+            "root": self.board.root().fen(),
+            "moves": [move.uci() for move in self.board.move_stack],
+            "redo": [move.uci() for move in self.redo_stack],
+            "human": self.human,
+            "discarded": discarded and {
+                "root": discarded.root().fen(),
+                "moves": [move.uci() for move in discarded.move_stack],
+            },
+            "version": self.version,
+        }
+
+    @classmethod
+    def from_dict(cls, game_id, data):
+        game = cls(game_id, replay(data["root"], data["moves"]), data["version"], data["human"])
+        game.redo_stack = [chess.Move.from_uci(move) for move in data["redo"]]
+        if data.get("discarded"):
+            game.discarded = replay(data["discarded"]["root"], data["discarded"]["moves"])
+        return game
+
+
+class GameStore:
+    """
+    Bounded in-process LRU of live games keyed by game id.
+
+    When a Django cache alias is given, every saved game is also written to that
+    cache as its starting position and move list, so a game evicted from the LRU
+    (or played through another worker process) can be rebuilt with its history.
+    """
+
+    def __init__(self, max_games=1000, cache_alias=None, timeout=None):
+        self.max_games = max_games
+        self.cache = caches[cache_alias] if cache_alias else None
+        self.timeout = timeout
+        self.games = OrderedDict()
+        self.lock = threading.Lock()
+
+    def cache_key(self, game_id):
+        return f"chess_app:game:{game_id}"
+
+    def remember(self, game):
+        with self.lock:
+            self.games[game.id] = game
+            self.games.move_to_end(game.id)
+            while len(self.games) > self.max_games:
+                self.games.popitem(last=False)
+
+    def create(self, fen=None):
+        """
+        Start a new game.
+
+        Parameters:
+        - fen (str): The starting position, defaults to the standard starting position.
+
+        Returns:
+        Game: The new game.
+        """
+        game = Game(uuid.uuid4().hex, chess.Board(fen) if fen else chess.Board())
+        self.save(game)
+        return game
+
+    def get(self, game_id):
+        """
+        Look up a game.
+
+        Parameters:
+        - game_id (str): The game id.
+
+        Returns:
+        Game: The game, or None if it is unknown or expired.
+        """
+        with self.lock:
+            game = self.games.get(game_id)
+            if game:
+                self.games.move_to_end(game_id)
+        if self.cache is None:
+            return game
+        data = self.cache.get(self.cache_key(game_id))
+        if data is None:
+            return game
+        if game is None or game.version != data["version"]:
+            game = Game.from_dict(game_id, data)
+            self.remember(game)
+        return game
+
+    def save(self, game):
+        """
+        Record the current state of a game after it changed.
+
+        Parameters:
+        - game (Game): The game.
+        """
+        game.version = uuid.uuid4().hex
+        self.remember(game)
+        if self.cache is not None:
+            self.cache.set(self.cache_key(game.id), game.to_dict(), self.timeout)
+
+
+def get_store():
+    """
+    Get the game store of this worker process, configured by CHESS_GAME_STORE.
+
+    Returns:
+    GameStore: The store.
+    """
+    global _store
+    if _store is None:
+        with _lock:
+            if _store is None:
+                config = settings.CHESS_GAME_STORE
+                _store = GameStore(config["max_games"], config.get("cache"), config.get("timeout"))
+    return _store
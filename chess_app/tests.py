@@ -0,0 +1,127 @@
+import random
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+import chess
+import numpy as np
+from django.test import SimpleTestCase
+from .benchmarks import legacy_calculate_score, legacy_minimax, random_positions, stub_session
+from .utils import inference
+from .utils.evaluation import Evaluator
+from .utils.minimax import Search, SearchTimeout
+from .utils.transposition import TranspositionTable
+
+
+class EvaluatorTests(SimpleTestCase):
+    """
+    The incremental Evaluator must score every position exactly like the original
+    calculate_score, kept as benchmarks.legacy_calculate_score.
+    """
+
+    def assert_scores_match(self, evaluator):
+        board = evaluator.board
+        for color in chess.COLORS:
+            self.assertEqual(evaluator.score(color), legacy_calculate_score(board, color), board.fen())
+
+    def test_matches_legacy_score_over_random_games(self):
+        rng = random.Random(0)
+        for _ in range(60):
+            evaluator = Evaluator(chess.Board())
+            self.assert_scores_match(evaluator)
+            for _ in range(rng.randint(20, 160)):
+                moves = list(evaluator.board.legal_moves)
+                if not moves:
+                    break
+                evaluator.push(rng.choice(moves))
+                self.assert_scores_match(evaluator)
+            while evaluator.board.move_stack:
+                evaluator.pop()
+                self.assert_scores_match(evaluator)
+
+    def test_matches_legacy_score_on_special_moves(self):
+        # Castling both ways, en passant and under-promotions with captures
+        fens = [
+            "r3k2r/pppq1ppp/2npbn2/2b1p3/2B1P3/2NPBN2/PPPQ1PPP/R3K2R w KQkq - 0 1",
+            "r3k2r/pppq1ppp/2npbn2/2b1p3/2B1P3/2NPBN2/PPPQ1PPP/R3K2R b KQkq - 0 1",
+            "rnbqkbnr/ppp1p1pp/8/3pPp2/8/8/PPPP1PPP/RNBQKBNR w KQkq f6 0 3",
+            "rnbqkbnr/pppp1ppp/8/8/3PpP2/8/PPP1P1PP/RNBQKBNR b KQkq d3 0 3",
+            "1n2k3/P6P/8/8/8/8/p6p/1N2K3 w - - 0 1",
+            "1n2k3/P6P/8/8/8/8/p6p/1N2K3 b - - 0 1",
+        ]
+        for fen in fens:
+            board = chess.Board(fen)
+            for move in list(board.legal_moves):
+                evaluator = Evaluator(board.copy())
+                evaluator.push(move)
+                self.assert_scores_match(evaluator)
+                evaluator.pop()
+                self.assert_scores_match(evaluator)
+
+
+class SearchTests(SimpleTestCase):
+    """
+    The alpha-beta search must pick the same move as the original full-width minimax,
+    kept as benchmarks.legacy_minimax, when searching to the same depth.
+    """
+
+    def test_matches_legacy_minimax_at_equal_depth(self):
+        positions = [board for board in random_positions(120, seed=1) if board.turn == chess.BLACK]
+        self.assertGreaterEqual(len(positions), 40)
+        differences = []
+        for board in positions[:40]:
+            expected, _ = legacy_minimax(board, 2, True)
+            move, _ = Search(TranspositionTable(1), quiescence=False).search(board, 2)
+            if move != expected:
+                differences.append((board.fen(), expected, move))
+        self.assertEqual(differences, [])
+
+    def test_interrupted_iteration_reports_its_move(self):
+        # Stop the search by node count instead of time, part way through each depth
+        fen = "r1bqkbnr/pppp1ppp/2n5/4p3/4P3/5N2/PPPP1PPP/RNBQKB1R w KQkq - 2 3"
+        for limit in (200, 1500, 6000):
+            search = Search(TranspositionTable(1))
+
+            def count_node(search=search, limit=limit):
+                search.nodes += 1
+                if search.nodes > limit:
+                    raise SearchTimeout()
+
+            search.count_node = count_node
+            board = chess.Board(fen)
+            move, score, info = search.iterate(board, 60000, 8)
+            self.assertTrue(search.timed_out)
+            self.assertTrue(info["partial"])
+            self.assertEqual(info["pv"][0], move.uci())
+            self.assertEqual(info["score"], score)
+            self.assertIn(move, board.legal_moves)
+            self.assertEqual(board.fen(), fen)
+
+
+class MicroBatcherTests(SimpleTestCase):
+    """
+    Boards predicted concurrently through the MicroBatcher are merged into fewer model
+    calls and get the same prediction as a single-board predict_batch. Uses the stub
+    model from benchmarks, so no model file is needed.
+    """
+
+    def test_concurrent_predictions_match_single_board(self):
+        session = stub_session()
+        boards = random_positions(16, seed=2)
+        expected = [inference.predict_batch([board], session)[0] for board in boards]
+
+        batch_sizes = []
+        original = inference.predict_batch
+
+        def predict_batch(batch):
+            batch_sizes.append(len(batch))
+            return original(batch, session)
+
+        batcher = inference.MicroBatcher(window_ms=100, max_batch=8)
+        with mock.patch.object(inference, 'predict_batch', predict_batch):
+            with ThreadPoolExecutor(len(boards)) as executor:
+                preds = list(executor.map(batcher.predict, boards))
+
+        for board, pred, single in zip(boards, preds, expected):
+            np.testing.assert_allclose(pred, single, rtol=1e-5, atol=1e-5, err_msg=board.fen())
+        self.assertEqual(sum(batch_sizes), len(boards))
+        self.assertLess(len(batch_sizes), len(boards))
+        self.assertLessEqual(max(batch_sizes), 8)
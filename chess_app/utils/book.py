@@ -0,0 +1,99 @@
+import struct
+import threading
+import chess
+import chess.polyglot
+from django.conf import settings
+from django.contrib.staticfiles import finders
+
+# Polyglot entries: key, move, weight, learn (big-endian, sorted by key)
+entry_struct = struct.Struct(">QHHI")
+promotion_codes = {None: 0, chess.KNIGHT: 1, chess.BISHOP: 2, chess.ROOK: 3, chess.QUEEN: 4}
+
+_reader = None
+_loaded = False
+_lock = threading.Lock()
+
+
+def get_reader():
+    """
+    Get the opening book of this worker process, memory-mapped on first use.
+
+    Returns:
+    chess.polyglot.MemoryMappedReader: The book, or None if CHESS_BOOK_PATH can not be found.
+    """
+    global _reader, _loaded
+    if not _loaded:
+        with _lock:
+            if not _loaded:
+                path = finders.find(settings.CHESS_BOOK_PATH) if settings.CHESS_BOOK_PATH else None
+                _reader = chess.polyglot.open_reader(path) if path else None
+                _loaded = True
+    return _reader
+
+
+def book_move(board, reader=None):
+    """
+    Look up the position in the opening book.
+
+    The book is binary searched by the Zobrist key of the board, only legal moves are
+    considered and the move with the highest weight is played.
+
+    Parameters:
+    - board (chess.Board): The chess board representing the current state of the game.
+    - reader (chess.polyglot.MemoryMappedReader): The book to use, defaults to CHESS_BOOK_PATH.
+
+    Returns:
+    chess.Move: The book move, or None if the position is not in the book.
+    """
+    if reader is None:
+        reader = get_reader()
+    if reader is None:
+        return None
+    entry = reader.get(board)
+    return entry.move if entry else None
+
+
+def encode_move(board, move):
+    """
+    Encode a move in the Polyglot format, where castling is written as the king
+    moving to its own rook.
+    """
+    to_square = move.to_square
+    if board.is_castling(move):
+        rook_file = 7 if board.is_kingside_castling(move) else 0
+        to_square = chess.square(rook_file, chess.square_rank(move.from_square))
+    return (chess.square_file(to_square) | chess.square_rank(to_square) << 3
+            | chess.square_file(move.from_square) << 6 | chess.square_rank(move.from_square) << 9
+            | promotion_codes[move.promotion] << 12)
+
+
+def build_book(games, path, plies=20, min_count=1):
+    """
+    Write a Polyglot opening book from the moves of played games.
+
+    Every position within the first `plies` half-moves gets one entry per move played
+    from it, weighted by how often it was played.
+
+    Parameters:
+    - games (iterable): Games as lists of chess.Move from the starting position.
+    - path (str): The file to write.
+    - plies (int): How many half-moves of every game go into the book.
+    - min_count (int): Moves played fewer times than this are left out.
+
+    Returns:
+    int: The number of entries written.
+    """
+    counts = {}
+    for moves in games:
+        board = chess.Board()
+        for move in moves[:plies]:
+            entry = (chess.polyglot.zobrist_hash(board), encode_move(board, move))
+            counts[entry] = counts.get(entry, 0) + 1
+            board.push(move)
+
+    entries = sorted(((key, move, count) for (key, move), count in counts.items()
+                      if count >= min_count), key=lambda entry: (entry[0], -entry[2]))
+    with open(path, "wb") as book_file:
+        for key, move, count in entries:
+            book_file.write(entry_struct.pack(key, move, min(count, 0xFFFF), 0))
+    return len(entries)
@@ -0,0 +1,170 @@
+import chess
+import numpy as np
+from .config import piece_weights, position_weights
+
+
+def build_square_tables():
+    """
+    Combine the material and position weights into integer indexed tables.
+
+    Returns:
+    list: square_tables[color][piece_type][square] holding the material weight plus the
+          position weight of a piece, with the same square mirroring as get_pieces
+          (white pieces are looked up at 63 - square).
+    """
+    tables = [[None] * 7, [None] * 7]
+    for piece_type in chess.PIECE_TYPES:
+        symbol = chess.piece_symbol(piece_type)
+        material = piece_weights[symbol]
+        weights = position_weights[symbol]
+        tables[chess.WHITE][piece_type] = tuple(
+            material + weights[63 - square] for square in chess.SQUARES)
+        tables[chess.BLACK][piece_type] = tuple(
+            material + weights[square] for square in chess.SQUARES)
+    return tables
+
+
+square_tables = build_square_tables()
+# The same tables as one contiguous array indexed [color, piece_type, square], piece type
+# 0 being empty. The tuples above stay faster for the single lookups of the Evaluator.
+square_array = np.array([[table or (0,) * 64 for table in square_tables[color]]
+                         for color in (chess.BLACK, chess.WHITE)], dtype=np.int32)
+# Flattened [color, piece_type * square] weights of the pawn to king rows.
+square_weights = np.ascontiguousarray(square_array[:, 1:].reshape(2, 6 * 64))
+
+
+def material_totals(boards):
+    """
+    Sum the material and position weights of many boards at once.
+
+    The pieces of every board are unpacked from their bitboards into a
+    [board, color, piece_type * square] bit array, which is multiplied with the
+    weights and summed.
+
+    Parameters:
+    - boards (list): The chess.Board objects to score.
+
+    Returns:
+    np.ndarray: The totals of every board, shape [board, color], indexed by chess.BLACK and
+                chess.WHITE.
+    """
+    masks = np.array([[[board.pieces_mask(piece_type, color) for piece_type in chess.PIECE_TYPES]
+                       for color in (chess.BLACK, chess.WHITE)] for board in boards], dtype="<u8")
+    bits = np.unpackbits(masks.view(np.uint8), axis=-1, bitorder="little")
+    return np.einsum("nck,ck->nc", bits.reshape(len(boards), 2, 6 * 64), square_weights)
+
+
+def check_bonus(board):
+    """
+    The bonus the opponent of the side to move gets for giving check or checkmate, see
+    Evaluator.score.
+    """
+    if not board.is_check():
+        return 0
+    return 1700 if board.is_checkmate() else 200
+
+
+def evaluate_batch(boards):
+    """
+    Score many positions at once, each the same as Evaluator(board).evaluate(): the
+    score of the side to move minus the score of its opponent.
+
+    The alpha-beta search keeps the incremental Evaluator, it needs one leaf at a time
+    to decide its cutoffs. This is for scoring positions in bulk.
+
+    Parameters:
+    - boards (list): The chess.Board objects to score.
+
+    Returns:
+    np.ndarray: One int64 score per board.
+    """
+    if not boards:
+        return np.zeros(0, dtype=np.int64)
+    totals = material_totals(boards).astype(np.int64)
+    turns = np.fromiter((board.turn for board in boards), dtype=np.intp, count=len(boards))
+    rows = np.arange(len(boards))
+    bonus = np.fromiter((check_bonus(board) for board in boards), dtype=np.int64, count=len(boards))
+    return totals[rows, turns] - totals[rows, 1 - turns] - bonus
+
+
+class Evaluator:
+    """
+    Keeps the material and piece-square totals of both colors up to date while moves
+    are pushed and popped, so scoring a position does not walk the whole board.
+
+    score(color) returns exactly what calculate_score(board, color) returns.
+    """
+
+    def __init__(self, board):
+        self.board = board
+        self.totals = material_totals([board])[0].tolist()
+        self.stack = []
+
+    def push(self, move):
+        """
+        Push a move on the board and update the totals.
+
+        Parameters:
+        - move (chess.Move): A legal move in the current position.
+        """
+        board = self.board
+        color = board.turn
+        table = square_tables[color]
+        piece_type = board.piece_type_at(move.from_square)
+        delta = table[move.promotion or piece_type][move.to_square] - table[piece_type][move.from_square]
+
+        captured = 0
+        if board.is_en_passant(move):
+            square = chess.square(chess.square_file(move.to_square), chess.square_rank(move.from_square))
+            captured = square_tables[not color][chess.PAWN][square]
+        elif board.is_castling(move):
+            rank = chess.square_rank(move.from_square)
+            if board.is_kingside_castling(move):
+                rook_from, rook_to = chess.square(7, rank), chess.square(5, rank)
+            else:
+                rook_from, rook_to = chess.square(0, rank), chess.square(3, rank)
+            delta += table[chess.ROOK][rook_to] - table[chess.ROOK][rook_from]
+        else:
+            victim = board.piece_type_at(move.to_square)
+            if victim:
+                captured = square_tables[not color][victim][move.to_square]
+
+        self.stack.append((self.totals[0], self.totals[1]))
+        self.totals[color] += delta
+        self.totals[not color] -= captured
+        board.push(move)
+
+    def pop(self):
+        """
+        Take back the last move and restore the totals.
+
+        Returns:
+        chess.Move: The move that was taken back.
+        """
+        self.totals[0], self.totals[1] = self.stack.pop()
+        return self.board.pop()
+
+    def score(self, color):
+        """
+        Calculate the overall score for a player from the maintained totals.
+
+        Parameters:
+        - color (chess.Color): The color for which to calculate the score.
+
+        Returns:
+        int: The score based on material, piece positions, and check status.
+        """
+        score = self.totals[color]
+        board = self.board
+        if color != board.turn and board.is_check():
+            score += 200
+            if board.is_checkmate():
+                score += 1500
+        return score
+
+    def evaluate(self):
+        """
+        Score of the side to move minus the score of its opponent.
+        """
+        turn = self.board.turn
+        return self.score(turn) - self.score(not turn)
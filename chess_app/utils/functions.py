@@ -1,175 +1,149 @@
-import re
+import base64
 import chess
 import numpy as np
-from .config import piece_weights, position_weights
-from .config import ltr_to_num, num_to_ltr
+from .evaluation import material_totals
 
+encoder_pieces = (chess.PAWN, chess.ROOK, chess.KNIGHT, chess.BISHOP, chess.QUEEN, chess.KING)
 
-def get_game_state(board):
+
+# Bit set in a packed move when the pawn promotes.
+PACKED_PROMOTION = 1 << 12
+
+
+def pack_moves(legal_moves):
+    """
+    Pack moves as little-endian uint16 values, from-square in bits 0-5, to-square in
+    bits 6-11 and PACKED_PROMOTION for promotions, with one value per from/to pair.
+
+    Parameters:
+    - legal_moves (list): The moves to pack.
+
+    Returns:
+    str: The packed moves, base64 encoded.
+    """
+    packed = dict.fromkeys(
+        move.from_square | move.to_square << 6 | (PACKED_PROMOTION if move.promotion else 0)
+        for move in legal_moves)
+    return base64.b64encode(np.array(list(packed), dtype="<u2").tobytes()).decode()
+
+
+def get_game_state(board, legal_moves=None, compact=False):
     """
     Get the current state of the chess game.
 
+    The legal moves are generated once and the game over status is derived from them,
+    the same as board.is_game_over() without generating the moves again.
+
     Parameters:
     - board (chess.Board): The chess board representing the current state of the game.
+    - legal_moves (list): The legal moves of the board if they were already generated.
+    - compact (bool): Send the legal moves packed in 'moves' (see pack_moves) instead of
+      the 'legal_moves' and 'promotions' strings.
 
     Returns:
     dict: A dictionary containing information about the game state, including legal moves,
           promotions, current board position in Forsyth-Edwards Notation (FEN),
           game over status, and check status.
     """
-    all_legal_moves = [str(move) for move in board.legal_moves]
-    legal_moves, promotions = set(), set()
-
-    for move in all_legal_moves:
-        if len(move) == 5:
-            promotions.add(move[:4])
-        legal_moves.add(move[:4])
-
-    game_state = {
-        "legal_moves": ",".join(legal_moves),
-        "promotions": ",".join(promotions),
-        "curr_board": board.fen(),
-        "is_game_over": board.is_game_over(),
-        "is_check": board.is_check(),
-    }
-
+    if legal_moves is None:
+        legal_moves = list(board.generate_legal_moves())
+    game_state = {}
+    if compact:
+        game_state["moves"] = pack_moves(legal_moves)
+    else:
+        names = chess.SQUARE_NAMES
+        moves, promotions = set(), set()
+        for move in legal_moves:
+            uci = names[move.from_square] + names[move.to_square]
+            moves.add(uci)
+            if move.promotion:
+                promotions.add(uci)
+        game_state["legal_moves"] = ",".join(moves)
+        game_state["promotions"] = ",".join(promotions)
+
+    game_state["curr_board"] = board.fen()
+    game_state["is_game_over"] = (not legal_moves or board.is_insufficient_material()
+                                  or board.is_seventyfive_moves() or board.is_fivefold_repetition())
+    game_state["is_check"] = board.is_check()
     return game_state
 
 
-def get_pieces(board, color):
+def calculate_score(board, color):
+    """
+    Calculate the overall score for a player in the chess game.
+
+    The material and position weights are summed over the piece bitboards with the
+    tables of the evaluation module.
+
+    Parameters:
+    - board (chess.Board): The chess board representing the current state of the game.
+    - color (chess.Color): The color for which to calculate the score.
+
+    Returns:
+    int: The calculated score based on material, piece positions, and check status.
     """
-    Get the positions of pieces on the chess board for a specific color.
+    score = int(material_totals([board])[0, int(color)])
+    if color != board.turn and board.is_check():
+        score += 200
+        if board.is_checkmate():
+            score += 1500
+    return score
+
+def board_repr(board, out=None):
+    """
+    Encode the board as the model input, one 8x8 layer per piece type
+    (pawn, rook, knight, bishop, queen, king) with 1 for white pieces and -1 for black
+    pieces. Rows run from rank 8 to rank 1 and columns from file a to file h.
+
+    The layers are unpacked straight from the piece bitboards.
 
     Parameters:
     - board (chess.Board): The chess board representing the current state of the game.
-    - color (chess.Color): The color for which to get the piece positions.
+    - out (np.ndarray): Optional float32 buffer of shape (6, 8, 8) or (1, 6, 8, 8) to write into.
 
     Returns:
-    list: A list of tuples containing piece type and position for the specified color.
+    np.ndarray: The float32 encoding of shape (1, 6, 8, 8), or `out` if it was given.
     """
-    positions = board.piece_map()
-    white_positions = []
-    black_positions = []
-    for pos, piece in positions.items():
-        piece_str = str(piece)
-        if piece_str.isupper():
-            white_positions.append((piece_str.lower(), 63 - pos))
-        else:
-            black_positions.append((piece_str, pos))
-    if color == chess.WHITE:
-        return white_positions
-    return black_positions
+    masks = np.array([board.pieces_mask(piece, color)
+                      for color in (chess.WHITE, chess.BLACK) for piece in encoder_pieces],
+                     dtype="<u8")
+    bits = np.unpackbits(masks.view(np.uint8), bitorder="little").reshape(2, 6, 8, 8)
+    if out is None:
+        out = np.empty((1, 6, 8, 8), dtype=np.float32)
+    np.subtract(bits[0, :, ::-1], bits[1, :, ::-1], out=out.reshape(6, 8, 8), dtype=np.float32)
+    return out
 
 
-def calculate_score(board, color):
+def move_gen(pred, board, moves=None):
     """
-    Calculate the overall score for a player in the chess game.
+    Pick the AI move from the model prediction.
+
+    The starting square is the legal from-square with the highest score in pred[0],
+    the destination is the highest scored square in pred[1] among the legal moves
+    from that square. Ties go to the move generated first. Pawns reaching the last
+    rank are promoted to a queen.
 
     Parameters:
+    - pred (np.ndarray): The model prediction of shape (2, 8, 8), rows from rank 8 to rank 1.
     - board (chess.Board): The chess board representing the current state of the game.
-    - color (chess.Color): The color for which to calculate the score.
+    - moves (list): The legal moves of the board, generated if not given.
 
     Returns:
-    int: The calculated score based on material, piece positions, and check status.
+    chess.Move: The selected move.
     """
-    board_fen = board.board_fen()
-    material_score = 0
-    for piece, weight in piece_weights.items():
-        if color == chess.WHITE:
-            piece = piece.upper()
-        material_score += board_fen.count(piece) * weight
-
-    board_pieces = get_pieces(board, color)
-    position_score = 0
-    for piece, pos in board_pieces:
-        position_score += position_weights[piece][pos]
-
-    check_score = 0
-    if color != board.turn:
-        if board.is_check():
-            check_score += 200
-        if board.is_checkmate():
-            check_score += 1500
-
-    return material_score + position_score + check_score
-
-def get_mapping(board, piece):
-    s = str(board)
-    s = re.sub(f"[^{piece}{piece.upper()} \n]", ".", str(board))
-    s = re.sub(f"{piece}", "-1", s)
-    s = re.sub(f"{piece.upper()}", "1", s)
-    s = re.sub(f"\.", "0", s)
-
-    matrix = []
-    for row in s.split("\n"):
-        row = row.split(" ")
-        row = [int(x) for x in row]
-        matrix.append(row)
-    return matrix
-
-
-def board_repr(board):
-    pieces = ["p", "r", "n", "b", "q", "k"]
-    layers = []
-    for piece in pieces:
-        layers.append(get_mapping(board, piece))
-    np_arr = np.array(layers, dtype=np.float32)
-    np_arr = np.expand_dims(np_arr, axis=0)
-    return np_arr
-
-
-def move_gen(pred, board):
-    # Create a chess board object from the given FEN string
-
-    # Initialize variables for the starting position
-    max_score = -1 * float("inf")
-    from_x, from_y = 0, 0
-
-    # Loop through all legal moves on the board
-    for move in board.legal_moves:
-        move = str(move)
-
-        # Extract row and column from the move string
-        row = 8 - int(move[1])
-        col = ltr_to_num[move[0]]
-
-        # Get the score from the prediction for the current move
-        cur_score = float(pred[0, row, col])
-
-        # Update the maximum score and corresponding position if the current score is higher
-        if cur_score > max_score:
-            max_score = cur_score
-            from_x = num_to_ltr[col]
-            from_y = 8 - row
-
-    # Build the starting position in chess notation (e.g., 'e2')
-    start = from_x + str(from_y)
-
-    # Reset max_score for the destination position
-    max_score = -1 * float("inf")
-    to_x, to_y = 0, 0
-
-    # Loop through all legal moves again
-    for move in board.legal_moves:
-        move = str(move)
-
-        # Check if the move starts from the previously determined starting position
-        if move[:2] == start:
-            # Extract row and column for the destination position
-            row = 8 - int(move[3])
-            col = ltr_to_num[move[2]]
-
-            # Get the score from the prediction for the current move
-            cur_score = float(pred[1, row, col])
-
-            # Update the maximum score and corresponding position if the current score is higher
-            if cur_score > max_score:
-                max_score = cur_score
-                to_x = num_to_ltr[col]
-                to_y = 8 - row
-
-    # Build the ending position in chess notation (e.g., 'e4')
-    end = to_x + str(to_y)
-
-    # Return the concatenated string representing the move (e.g., 'e2e4')
-    return start + end
+    if moves is None:
+        moves = list(board.legal_moves)
+    count = len(moves)
+    from_squares = np.fromiter((move.from_square for move in moves), dtype=np.intp, count=count)
+    to_squares = np.fromiter((move.to_square for move in moves), dtype=np.intp, count=count)
+
+    # Square a1 is 0 and h8 is 63 while the prediction rows start at rank 8,
+    # so flipping the rank bits (square ^ 56) gives the flat prediction index.
+    start = from_squares[np.argmax(pred[0].ravel()[from_squares ^ 56])]
+    candidates = np.flatnonzero(from_squares == start)
+    best = candidates[np.argmax(pred[1].ravel()[to_squares[candidates] ^ 56])]
+
+    move = moves[best]
+    if move.promotion:
+        return chess.Move(move.from_square, move.to_square, chess.QUEEN)
+    return move
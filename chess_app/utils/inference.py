@@ -1,25 +1,128 @@
+import time
+import queue
+import threading
 import numpy as np
-from onnxruntime import InferenceSession
+from concurrent.futures import Future
+from django.conf import settings
 from .functions import board_repr, move_gen
-from django.contrib.staticfiles import finders
-from .functions import get_game_state
-
-def predict(board):
-    for move in board.legal_moves:
-        board.push(move)
-        if board.is_checkmate():
-            return board.pop()
-        board.pop()
-    path = finders.find("chess_app/models/chess_model.onnx")
-    session = InferenceSession(path, providers=["CPUExecutionProvider"])
-    inputs = {session.get_inputs()[0].name: board_repr(board)}
-    outs = session.run(None, inputs)
-    pred = np.squeeze(outs[0])
-    move = move_gen(pred, board)
-    
-    game_state = get_game_state(board)
-    if move in game_state["promotions"]:
-        move += 'q'
-    
-    board.push_uci(move)
-    return board.pop()
+from .model_registry import get_session
+from . import instrumentation
+
+_batcher = None
+_lock = threading.Lock()
+
+
+def predict_batch(boards, session=None):
+    """
+    Run the model on several positions with a single session.run call.
+
+    Parameters:
+    - boards (list): The chess.Board objects to evaluate.
+    - session (InferenceSession): The session to run, defaults to the CHESS_MODEL_PATH session.
+
+    Returns:
+    list: One prediction per board, each the squeezed model output for that board
+          (the from-square and to-square score planes).
+    """
+    session = session or get_session()
+    with instrumentation.stage("encode"):
+        inputs = np.empty((len(boards), 6, 8, 8), dtype=np.float32)
+        for i, board in enumerate(boards):
+            board_repr(board, out=inputs[i])
+    with instrumentation.stage("inference"):
+        outs = session.run(None, {session.get_inputs()[0].name: inputs})
+    return [np.squeeze(pred) for pred in outs[0]]
+
+
+class MicroBatcher:
+    """
+    Merges predictions requested by concurrent threads within a short window
+    into one predict_batch call.
+
+    A background thread waits for the first board, then collects more boards for
+    up to `window_ms` milliseconds (or until `max_batch` boards are queued) and
+    runs them together. Callers block on a Future for their own row.
+    """
+
+    def __init__(self, window_ms, max_batch):
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self.queue = queue.Queue()
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def submit(self, board):
+        """
+        Queue a board for the next batch.
+
+        Returns:
+        Future: Resolves to the prediction for the board.
+        """
+        if self.thread is None:
+            with self.lock:
+                if self.thread is None:
+                    self.thread = threading.Thread(target=self.run, daemon=True)
+                    self.thread.start()
+        future = Future()
+        self.queue.put((board, future))
+        return future
+
+    def predict(self, board):
+        return self.submit(board).result()
+
+    def run(self):
+        while True:
+            items = [self.queue.get()]
+            deadline = time.monotonic() + self.window
+            while len(items) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    items.append(self.queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                preds = predict_batch([board for board, _ in items])
+            except Exception as error:
+                for _, future in items:
+                    future.set_exception(error)
+                continue
+            for (_, future), pred in zip(items, preds):
+                future.set_result(pred)
+
+
+def get_batcher():
+    """
+    Get the micro-batcher of this worker process.
+
+    Returns:
+    MicroBatcher: The batcher, or None if CHESS_BATCH_WINDOW_MS is 0.
+    """
+    global _batcher
+    if _batcher is None and settings.CHESS_BATCH_WINDOW_MS > 0:
+        with _lock:
+            if _batcher is None:
+                _batcher = MicroBatcher(settings.CHESS_BATCH_WINDOW_MS, settings.CHESS_BATCH_MAX_SIZE)
+    return _batcher
+
+
+def predict(board, moves=None):
+    """
+    Predict the AI move with the chess model.
+
+    Parameters:
+    - board (chess.Board): The chess board representing the current state of the game.
+    - moves (list): The legal moves of the board, generated if not given.
+
+    Returns:
+    chess.Move: The move with the best from-square and to-square scores.
+    """
+    batcher = get_batcher()
+    if batcher:
+        with instrumentation.stage("batch"):
+            pred = batcher.predict(board)
+    else:
+        pred = predict_batch([board])[0]
+    with instrumentation.stage("move_gen"):
+        return move_gen(pred, board, moves)
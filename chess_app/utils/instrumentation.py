@@ -0,0 +1,148 @@
+import json
+import time
+import logging
+import functools
+import contextvars
+from contextlib import nullcontext
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+_recorder = contextvars.ContextVar("chess_app_recorder", default=None)
+null_stage = nullcontext()
+
+
+class Recorder:
+    """
+    Stage durations in milliseconds and counters collected while serving one request.
+    """
+
+    def __init__(self):
+        self.stages = {}
+        self.counters = {}
+
+    def add_time(self, name, ms):
+        self.stages[name] = self.stages.get(name, 0) + ms
+
+    def count(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def merge(self, data):
+        """
+        Add the timings recorded by another process, see to_dict.
+        """
+        for name, ms in data["stages"].items():
+            self.add_time(name, ms)
+        for name, value in data["counters"].items():
+            self.count(name, value)
+
+    def to_dict(self):
+        return {"stages": self.stages, "counters": self.counters}
+
+    def server_timing(self):
+        """
+        Format the stages as a Server-Timing header value.
+        """
+        return ", ".join(f"{name};dur={ms:.2f}" for name, ms in self.stages.items())
+
+
+class Stage:
+    __slots__ = ("recorder", "name", "start")
+
+    def __init__(self, recorder, name):
+        self.recorder = recorder
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        self.recorder.add_time(self.name, (time.perf_counter() - self.start) * 1000)
+
+
+def is_enabled():
+    return settings.CHESS_INSTRUMENTATION["enabled"]
+
+
+def start():
+    """
+    Start recording for the current request, task or process.
+
+    Returns:
+    tuple: The new Recorder and the token to pass to stop(), or (None, None) when
+           CHESS_INSTRUMENTATION is disabled.
+    """
+    if not is_enabled():
+        return None, None
+    recorder = Recorder()
+    return recorder, _recorder.set(recorder)
+
+
+def stop(token):
+    if token is not None:
+        _recorder.reset(token)
+
+
+def stage(name):
+    """
+    Time a block as a stage of the current request:
+
+        with instrumentation.stage("encode"):
+            ...
+
+    Returns:
+    A context manager, a shared no-op one when nothing is being recorded.
+    """
+    recorder = _recorder.get()
+    if recorder is None:
+        return null_stage
+    return Stage(recorder, name)
+
+
+def count(name, value=1):
+    """
+    Add to a counter of the current request, does nothing when nothing is being recorded.
+    """
+    recorder = _recorder.get()
+    if recorder is not None:
+        recorder.count(name, value)
+
+
+def merge(data):
+    """
+    Add timings returned by a pool process to the current request.
+
+    Parameters:
+    - data (dict): Recorder.to_dict() of the process, or None.
+    """
+    recorder = _recorder.get()
+    if recorder is not None and data:
+        recorder.merge(data)
+
+
+def instrument_view(view):
+    """
+    Record the stages of an async view. When CHESS_INSTRUMENTATION is enabled, every
+    request is logged as one JSON line and, with 'server_timing', the stages are sent
+    in the Server-Timing header.
+    """
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        recorder, token = start()
+        if recorder is None:
+            return await view(request, *args, **kwargs)
+        try:
+            with Stage(recorder, "total"):
+                response = await view(request, *args, **kwargs)
+        finally:
+            stop(token)
+        logger.info(json.dumps({
+            "view": view.__name__,
+            "status": response.status_code,
+            "stages": {name: round(ms, 3) for name, ms in recorder.stages.items()},
+            "counters": recorder.counters,
+        }))
+        if settings.CHESS_INSTRUMENTATION["server_timing"]:
+            response["Server-Timing"] = recorder.server_timing()
+        return response
+    return wrapper
@@ -1,36 +1,428 @@
+import time
 import chess
-from .functions import calculate_score
+from chess.polyglot import zobrist_hash
+from .config import piece_weights
+from .evaluation import Evaluator
+from . import instrumentation
+from .transposition import EXACT, LOWER, UPPER, get_table
 
-def predict(board, depth, is_ai):
+INFINITY = 10 ** 9
+# The clock is only read every this many nodes.
+DEADLINE_CHECK_NODES = 1024
+piece_values = {chess.PAWN: 1, chess.KNIGHT: 3, chess.BISHOP: 3,
+                chess.ROOK: 5, chess.QUEEN: 9, chess.KING: 20}
+# Material in evaluation units, used by the static exchange evaluation.
+see_values = {piece_type: piece_weights[chess.piece_symbol(piece_type)]
+              for piece_type in chess.PIECE_TYPES}
+# A capture is skipped in the quiescence search when even winning the piece plus
+# this margin (a pawn) can not raise the score to alpha.
+DELTA_MARGIN = see_values[chess.PAWN]
+
+
+class SearchTimeout(Exception):
+    """
+    Raised inside the search when the deadline has passed.
+    """
+
+
+def attackers_to(board, square, occupied):
+    """
+    Bitboard of the pieces of both colors attacking a square, with sliding attacks
+    computed through the given occupancy so pieces behind a capturer (x-rays) appear
+    once it has been removed.
+    """
+    rank = chess.BB_RANK_ATTACKS[square][chess.BB_RANK_MASKS[square] & occupied]
+    file = chess.BB_FILE_ATTACKS[square][chess.BB_FILE_MASKS[square] & occupied]
+    diag = chess.BB_DIAG_ATTACKS[square][chess.BB_DIAG_MASKS[square] & occupied]
+    queens_and_rooks = board.queens | board.rooks
+    queens_and_bishops = board.queens | board.bishops
+    attackers = ((chess.BB_KING_ATTACKS[square] & board.kings)
+                 | (chess.BB_KNIGHT_ATTACKS[square] & board.knights)
+                 | ((rank | file) & queens_and_rooks)
+                 | (diag & queens_and_bishops)
+                 | (chess.BB_PAWN_ATTACKS[chess.BLACK][square] & board.pawns & board.occupied_co[chess.WHITE])
+                 | (chess.BB_PAWN_ATTACKS[chess.WHITE][square] & board.pawns & board.occupied_co[chess.BLACK]))
+    return attackers & occupied
+
+
+def static_exchange(board, move):
+    """
+    Static exchange evaluation: the material the side to move wins with a capture or
+    promotion when both sides keep recapturing on the target square with their least
+    valuable piece and may stop whenever continuing would lose material.
+
+    Parameters:
+    - board (chess.Board): The position before the move.
+    - move (chess.Move): A legal capture or promotion.
+
+    Returns:
+    int: The expected material gain in evaluation units, negative if the move loses material.
+    """
+    target = move.to_square
+    occupied = board.occupied & ~chess.BB_SQUARES[move.from_square]
+    victim = board.piece_type_at(target)
+    if victim is None and board.is_en_passant(move):
+        victim = chess.PAWN
+        occupied &= ~chess.BB_SQUARES[target ^ 8]
+    gain = [see_values[victim] if victim else 0]
+    attacker = board.piece_type_at(move.from_square)
+    if move.promotion:
+        gain[0] += see_values[move.promotion] - see_values[chess.PAWN]
+        attacker = move.promotion
+    side = not board.turn
+
+    while True:
+        attackers = attackers_to(board, target, occupied) & board.occupied_co[side]
+        if not attackers:
+            break
+        for piece_type in chess.PIECE_TYPES:
+            pieces = attackers & board.pieces_mask(piece_type, side)
+            if pieces:
+                break
+        # The next capture wins the last capturer and risks the piece making it.
+        gain.append(see_values[attacker] - gain[-1])
+        if max(-gain[-2], gain[-1]) < 0:
+            break
+        occupied &= ~(pieces & -pieces)
+        attacker = piece_type
+        side = not side
+
+    for depth in range(len(gain) - 1, 0, -1):
+        gain[depth - 1] = -max(-gain[depth - 1], gain[depth])
+    return gain[0]
+
+
+class Search:
+    """
+    Negamax search with alpha-beta pruning.
+
+    Moves are ordered by MVV-LVA for captures and promotions, then killer moves,
+    then the history heuristic, so that cutoffs happen as early as possible.
+    Scores are always seen from the side to move, using the same evaluation as
+    the original minimax (own score minus opponent score), kept up to date
+    incrementally by an Evaluator while moves are pushed and popped.
+    Results are stored in a transposition table so positions reached through
+    different move orders (or in earlier requests) are not searched again.
+
+    With quiescence enabled, the leaves are not scored directly but searched on
+    through captures and promotions until the position is quiet, so the search
+    does not stop in the middle of an exchange (the horizon effect).
+    """
+
+    def __init__(self, table, deadline=None, quiescence=True):
+        self.table = table
+        self.deadline = deadline
+        self.quiescence = quiescence
+        self.killers = {}
+        self.history = {}
+        self.nodes = 0
+        self.qnodes = 0
+        self.evaluator = None
+        self.timed_out = False
+        self.pv = []
+
+    def is_terminal(self, board, moves):
+        """
+        Same outcome as board.is_game_over(), but reusing the generated legal moves.
+        """
+        return (not moves or board.is_insufficient_material()
+                or board.is_seventyfive_moves() or board.is_fivefold_repetition())
+
+    def move_score(self, board, move, ply, tt_move=None):
+        if move == tt_move:
+            return 4 * INFINITY
+        if ply < len(self.pv) and move == self.pv[ply]:
+            return 3 * INFINITY
+        victim = board.piece_type_at(move.to_square)
+        if victim is None and board.is_en_passant(move):
+            victim = chess.PAWN
+        if victim or move.promotion:
+            attacker = board.piece_type_at(move.from_square)
+            score = 10 * piece_values.get(victim, 0) - piece_values[attacker]
+            score += 10 * piece_values.get(move.promotion, 0)
+            return 2 * INFINITY + score
+        if move in self.killers.get(ply, ()):
+            return INFINITY
+        return self.history.get((move.from_square, move.to_square), 0)
+
+    def order(self, board, moves, ply, tt_move=None):
+        return sorted(moves, key=lambda move: self.move_score(board, move, ply, tt_move),
+                      reverse=True)
+
+    def store_cutoff(self, board, move, depth, ply):
+        if board.is_capture(move) or move.promotion:
+            return
+        killers = self.killers.setdefault(ply, [])
+        if move not in killers:
+            killers.insert(0, move)
+            del killers[2:]
+        key = (move.from_square, move.to_square)
+        self.history[key] = self.history.get(key, 0) + depth * depth
+
+    def count_node(self):
+        self.nodes += 1
+        if self.deadline and self.nodes % DEADLINE_CHECK_NODES == 0 and time.time() > self.deadline:
+            raise SearchTimeout()
+
+    def noisy_moves(self, board):
+        """
+        Legal captures and promotions with their static exchange value, best first.
+        Captures that lose material are left out.
+        """
+        own_pawns = board.pawns & board.occupied_co[board.turn]
+        promotions = board.generate_legal_moves(own_pawns, chess.BB_BACKRANKS & ~board.occupied)
+        scored = []
+        for move in board.generate_legal_captures():
+            gain = static_exchange(board, move)
+            if gain >= 0:
+                scored.append((gain, move))
+        for move in promotions:
+            scored.append((static_exchange(board, move), move))
+        scored.sort(key=lambda item: item[0], reverse=True)
+        return scored
+
+    def quiesce(self, board, alpha, beta):
+        """
+        Search captures and promotions only, until the position is quiet.
+
+        The side to move may always stand pat on the static evaluation. Captures are
+        ordered and pruned by static exchange evaluation, and delta pruning skips those
+        that can not raise the score to alpha even when the piece is won for free.
+        """
+        self.count_node()
+        self.qnodes += 1
+        stand_pat = best = self.evaluator.evaluate()
+        if best >= beta:
+            return best
+        if best > alpha:
+            alpha = best
+        for gain, move in self.noisy_moves(board):
+            if not move.promotion and stand_pat + gain + DELTA_MARGIN <= alpha:
+                continue
+            self.evaluator.push(move)
+            score = -self.quiesce(board, -beta, -alpha)
+            self.evaluator.pop()
+            if score > best:
+                best = score
+            if score > alpha:
+                alpha = score
+            if alpha >= beta:
+                break
+        return best
+
+    def negamax(self, board, depth, alpha, beta, ply):
+        if depth == 0:
+            if self.quiescence:
+                return self.quiesce(board, alpha, beta)
+            self.count_node()
+            return self.evaluator.evaluate()
+        self.count_node()
+        key = zobrist_hash(board)
+        entry = self.table.probe(key)
+        tt_move = None
+        if entry:
+            _, entry_depth, bound, score, tt_move, _ = entry
+            if entry_depth >= depth and (bound == EXACT or (bound == LOWER and score >= beta)
+                                         or (bound == UPPER and score <= alpha)):
+                return score
+        moves = list(board.generate_legal_moves())
+        if self.is_terminal(board, moves):
+            return self.evaluator.evaluate()
+
+        alpha_start = alpha
+        best, best_move = -INFINITY, None
+        for move in self.order(board, moves, ply, tt_move):
+            self.evaluator.push(move)
+            score = -self.negamax(board, depth - 1, -beta, -alpha, ply + 1)
+            self.evaluator.pop()
+            if score > best:
+                best, best_move = score, move
+            if score > alpha:
+                alpha = score
+            if alpha >= beta:
+                self.store_cutoff(board, move, depth, ply)
+                break
+
+        if best <= alpha_start:
+            bound = UPPER
+        elif best >= beta:
+            bound = LOWER
+        else:
+            bound = EXACT
+        self.table.store(key, depth, bound, best, best_move)
+        return best
+
+    def search(self, board, depth, moves=None):
+        """
+        Search the root position and return the best move with its score.
+
+        Ties are broken in favour of the move generated first, exactly like the plain
+        minimax: a move generated before the current best is searched with a window
+        one point lower, so an equal score is still proven exactly.
+
+        If the deadline passes, the board is restored and the best move among the
+        fully searched root moves is returned (the first ordered move if there is none).
+        """
+        self.nodes += 1
+        self.evaluator = Evaluator(board)
+        self.table.new_search()
+        if moves is None:
+            moves = list(board.generate_legal_moves())
+        if depth == 0 or self.is_terminal(board, moves):
+            return None, self.evaluator.evaluate()
+
+        key = zobrist_hash(board)
+        entry = self.table.probe(key)
+        tt_move = entry[4] if entry else None
+        index = {move: i for i, move in enumerate(moves)}
+        ordered = self.order(board, moves, 0, tt_move)
+        best_move, best_score, best_index = None, -INFINITY, len(moves)
+        try:
+            for move in ordered:
+                alpha = best_score - 1 if index[move] < best_index else best_score
+                self.evaluator.push(move)
+                score = -self.negamax(board, depth - 1, -INFINITY, -alpha, 1)
+                self.evaluator.pop()
+                if score > alpha:
+                    best_move, best_score, best_index = move, score, index[move]
+        except SearchTimeout:
+            self.timed_out = True
+            while self.evaluator.stack:
+                self.evaluator.pop()
+            if best_move is None:
+                return ordered[0], -INFINITY
+            return best_move, best_score
+        self.table.store(key, depth, EXACT, best_score, best_move)
+        return best_move, best_score
+
+    def principal_variation(self, board, depth):
+        """
+        Follow the best moves stored in the transposition table from the root.
+
+        Returns:
+        list: Up to `depth` moves, the expected line of play.
+        """
+        line = []
+        for _ in range(depth):
+            entry = self.table.probe(zobrist_hash(board))
+            if entry is None or entry[4] is None or not board.is_legal(entry[4]):
+                break
+            line.append(entry[4])
+            board.push(entry[4])
+        for _ in line:
+            board.pop()
+        return line
+
+    def iterate(self, board, budget_ms, max_depth, moves=None):
+        """
+        Iterative deepening: search depth 1, 2, ... until the time budget runs out.
+
+        Every iteration starts with the principal variation of the previous one, so
+        most of the tree is cut off early. A new iteration is only started while less
+        than half of the budget is used, since it takes several times longer than the
+        previous one. If the deadline hits in the middle of an iteration, its best
+        move is used only when at least one root move was fully searched, and the
+        iteration is then reported as reached but partial.
+
+        Returns:
+        tuple: The best move, its score and a dict with the depth reached, whether that
+               depth was only partly searched, nodes searched (qnodes of them in the
+               quiescence search), nodes per second, time used and principal variation,
+               which always starts with the best move.
+        """
+        start = time.time()
+        budget = budget_ms / 1000
+        if self.deadline is None or start + budget < self.deadline:
+            self.deadline = start + budget
+        best_move, best_score, reached, partial = None, None, 0, False
+        for depth in range(1, max_depth + 1):
+            move, score = self.search(board, depth, moves)
+            if self.timed_out:
+                if score > -INFINITY or best_move is None:
+                    best_move, best_score = move, score
+                    if score > -INFINITY:
+                        reached, partial = depth, True
+                    board.push(move)
+                    self.pv = [move] + self.principal_variation(board, depth - 1)
+                    board.pop()
+                break
+            best_move, best_score, reached = move, score, depth
+            self.pv = self.principal_variation(board, depth)
+            if move is None or time.time() - start > budget / 2:
+                break
+        elapsed = time.time() - start
+        info = {
+            "depth": reached,
+            "partial": partial,
+            "nodes": self.nodes,
+            "qnodes": self.qnodes,
+            "nps": int(self.nodes / elapsed) if elapsed else 0,
+            "time_ms": int(elapsed * 1000),
+            "score": best_score,
+            "pv": [move.uci() for move in self.pv],
+        }
+        return best_move, best_score, info
+
+
+def record_search(search, probes, hits):
+    """
+    Add the work of a finished search to the instrumentation counters of the request.
+    """
+    instrumentation.count("nodes", search.nodes)
+    instrumentation.count("qnodes", search.qnodes)
+    instrumentation.count("tt_probes", search.table.probes - probes)
+    instrumentation.count("tt_hits", search.table.hits - hits)
+
+
+def think(board, budget_ms, max_depth, table=None, moves=None, deadline=None, quiescence=True):
     '''
-    Recursively predicts the best move for the AI using the minimax algorithm.
+    Predicts the best move for the side to move within a time budget, deepening the
+    search iteratively.
 
     Parameters:
     - board: The chess board representing the current state of the game.
-    - depth (int): The depth of the minimax search tree.
-    - is_ai (bool): Indicates whether the current player is the AI (True) or the opponent (False).
+    - budget_ms (int): The time budget of the search in milliseconds.
+    - max_depth (int): The depth at which to stop even if time is left.
+    - table (TranspositionTable): The table to use, defaults to the one shared by the worker.
+    - moves (list): The legal moves of the board, generated if not given.
+    - deadline (float): Optional time.time() value the search must not run past.
+    - quiescence (bool): Whether to extend the leaves with a capture search.
+
+    Returns:
+    tuple: The best move (chess.Move) and a dict with the depth reached, nodes searched,
+           nodes per second, time used, score, principal variation and the transposition
+           table stats.
+    '''
+    search = Search(table or get_table(), deadline, quiescence)
+    probes, hits = search.table.probes, search.table.hits
+    with instrumentation.stage("search"):
+        move, _, info = search.iterate(board, budget_ms, max_depth, moves)
+    record_search(search, probes, hits)
+    info["table"] = search.table.stats()
+    return move, info
+
+
+def predict(board, depth, is_ai=True, table=None, moves=None, deadline=None, quiescence=True):
+    '''
+    Predicts the best move for the side to move using negamax with alpha-beta pruning.
+
+    Parameters:
+    - board: The chess board representing the current state of the game.
+    - depth (int): The depth of the search tree.
+    - is_ai (bool): Indicates whether the side to move is the AI (True) or the opponent (False).
+    - table (TranspositionTable): The table to use, defaults to the one shared by the worker.
+    - moves (list): The legal moves of the board, generated if not given.
+    - deadline (float): Optional time.time() value after which the best move found so far
+      is returned.
+    - quiescence (bool): Whether to extend the leaves with a capture search.
 
     Returns:
     tuple: A tuple containing the best move (chess.Move) and its corresponding evaluation score.
-           The evaluation score is based on the current board position and the specified depth.
+           The evaluation score is seen from the AI's side.
     '''
-    if depth == 0 or board.is_game_over():
-        chessai_score = calculate_score(board, chess.BLACK)
-        player1_score = calculate_score(board, chess.WHITE)
-        return None, chessai_score - player1_score
-    
-    eval = -1*float('inf') if is_ai else float('inf')
-    best_move = None
-    for move in board.legal_moves:
-        board.push(move)
-        _, curr_eval = predict(board, depth - 1, not is_ai)
-        board.pop()
-        if is_ai:
-            if curr_eval > eval:
-                eval = curr_eval
-                best_move = move
-        else:
-            if curr_eval < eval:
-                eval = curr_eval
-                best_move = move
-    return best_move, eval
+    search = Search(table or get_table(), deadline, quiescence)
+    probes, hits = search.table.probes, search.table.hits
+    with instrumentation.stage("search"):
+        move, score = search.search(board, depth, moves)
+    record_search(search, probes, hits)
+    return move, score if is_ai else -score
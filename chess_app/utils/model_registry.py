@@ -0,0 +1,141 @@
+import os
+import logging
+import threading
+import numpy as np
+from onnxruntime import InferenceSession, SessionOptions, GraphOptimizationLevel
+from django.conf import settings
+from django.contrib.staticfiles import finders
+
+logger = logging.getLogger(__name__)
+
+optimization_levels = {
+    "disable": GraphOptimizationLevel.ORT_DISABLE_ALL,
+    "basic": GraphOptimizationLevel.ORT_ENABLE_BASIC,
+    "extended": GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+    "all": GraphOptimizationLevel.ORT_ENABLE_ALL,
+}
+
+_sessions = {}
+_lock = threading.Lock()
+
+
+def session_options(config):
+    """
+    Build the ONNX Runtime session options from the chess settings.
+
+    Parameters:
+    - config (dict): The CHESS_SESSION_OPTIONS setting.
+
+    Returns:
+    SessionOptions: Options with thread counts and graph optimization level applied.
+    """
+    options = SessionOptions()
+    if config.get("intra_op_num_threads"):
+        options.intra_op_num_threads = config["intra_op_num_threads"]
+    if config.get("inter_op_num_threads"):
+        options.inter_op_num_threads = config["inter_op_num_threads"]
+    level = config.get("graph_optimization_level") or "all"
+    options.graph_optimization_level = optimization_levels[level]
+    return options
+
+
+def is_current(optimized_path, source_path):
+    """
+    Check whether an optimized model was generated from the current source model.
+
+    Parameters:
+    - optimized_path (str): The path of the serialized optimized model.
+    - source_path (str): The path of the source ONNX model.
+
+    Returns:
+    bool: True if the optimized model exists and is not older than the source.
+    """
+    if not os.path.exists(optimized_path):
+        return False
+    return os.path.getmtime(optimized_path) >= os.path.getmtime(source_path)
+
+
+def load_session(model_path):
+    """
+    Create an inference session for a model stored in the static files.
+
+    When an optimized model path is configured, the optimized graph is serialized there
+    the first time and loaded directly (without re-optimizing) on later startups. It is
+    serialized again whenever the source model is newer than the optimized copy.
+
+    Parameters:
+    - model_path (str): The static path of the ONNX model.
+
+    Returns:
+    InferenceSession: The loaded session, or None if the model file can not be found.
+    """
+    path = finders.find(model_path)
+    if not path:
+        return None
+    config = settings.CHESS_SESSION_OPTIONS
+    options = session_options(config)
+    optimized_path = config.get("optimized_model_path")
+    if optimized_path and is_current(optimized_path, path):
+        path = optimized_path
+        options.graph_optimization_level = GraphOptimizationLevel.ORT_DISABLE_ALL
+    elif optimized_path:
+        options.optimized_model_filepath = optimized_path
+    return InferenceSession(path, sess_options=options, providers=["CPUExecutionProvider"])
+
+
+def get_session(model_path=None):
+    """
+    Get the process-wide inference session for a model, loading it on first use.
+
+    Sessions are shared between threads, ONNX Runtime allows concurrent calls to run().
+
+    Parameters:
+    - model_path (str): The static path of the ONNX model, defaults to CHESS_MODEL_PATH.
+
+    Returns:
+    InferenceSession: The cached session.
+
+    Raises:
+    FileNotFoundError: If the model file can not be found.
+    """
+    model_path = model_path or settings.CHESS_MODEL_PATH
+    session = _sessions.get(model_path)
+    if session is None:
+        with _lock:
+            session = _sessions.get(model_path)
+            if session is None:
+                session = load_session(model_path)
+                if session is None:
+                    raise FileNotFoundError(model_path)
+                _sessions[model_path] = session
+    return session
+
+
+def warmup(model_path=None):
+    """
+    Load the model and run one inference on an empty board so the first request
+    does not pay for session creation and memory allocation.
+
+    Parameters:
+    - model_path (str): The static path of the ONNX model, defaults to CHESS_MODEL_PATH.
+
+    Returns:
+    bool: True if the model was loaded, False if it is missing.
+    """
+    try:
+        session = get_session(model_path)
+    except FileNotFoundError as error:
+        logger.warning("Chess model not found, skipping warmup: %s", error)
+        return False
+    model_input = session.get_inputs()[0]
+    shape = [dim if isinstance(dim, int) else 1 for dim in model_input.shape]
+    session.run(None, {model_input.name: np.zeros(shape, dtype=np.float32)})
+    return True
+
+
+def clear():
+    """
+    Drop all cached sessions, the next call to get_session() reloads the model.
+    """
+    with _lock:
+        _sessions.clear()
@@ -0,0 +1,23 @@
+def find_mate_in_one(board, moves):
+    """
+    Find a move that checkmates the opponent immediately.
+
+    Only checking moves can mate, so every other move is skipped without
+    pushing it on the board.
+
+    Parameters:
+    - board (chess.Board): The chess board representing the current state of the game.
+    - moves (list): The legal moves of the board.
+
+    Returns:
+    chess.Move: The first mating move in generation order, or None.
+    """
+    for move in moves:
+        if not board.gives_check(move):
+            continue
+        board.push(move)
+        is_mate = board.is_checkmate()
+        board.pop()
+        if is_mate:
+            return move
+    return None
@@ -0,0 +1,114 @@
+import threading
+from django.conf import settings
+
+EXACT, LOWER, UPPER = 0, 1, 2
+# Rough size in bytes of one stored entry (the tuple, its ints and the move) plus its slot.
+ENTRY_SIZE = 160
+
+_table = None
+_lock = threading.Lock()
+
+
+class TranspositionTable:
+    """
+    Bounded transposition table keyed by the Zobrist hash of a position.
+
+    Every bucket holds two entries: a depth-preferred one that is only replaced by a
+    search at least as deep (or by any search of a newer generation) and an
+    always-replace one that keeps the most recent shallower result. Entries are
+    immutable tuples (key, depth, bound, score, move, generation), so the table can
+    be shared by the threads of a worker without locking.
+    """
+
+    def __init__(self, size_mb=16):
+        self.size_mb = size_mb
+        self.buckets = max(1, size_mb * 1024 * 1024 // (2 * ENTRY_SIZE))
+        self.clear()
+
+    def clear(self):
+        """
+        Drop every entry and reset the counters.
+        """
+        self.deep = [None] * self.buckets
+        self.recent = [None] * self.buckets
+        self.generation = 0
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+
+    def new_search(self):
+        """
+        Start a new generation, entries of older searches become replaceable.
+        """
+        self.generation += 1
+
+    def probe(self, key):
+        """
+        Look up a position.
+
+        Parameters:
+        - key (int): The Zobrist hash of the position.
+
+        Returns:
+        tuple: The stored (key, depth, bound, score, move, generation) entry or None.
+        """
+        self.probes += 1
+        index = key % self.buckets
+        entry = self.deep[index]
+        if entry is None or entry[0] != key:
+            entry = self.recent[index]
+            if entry is None or entry[0] != key:
+                return None
+        self.hits += 1
+        return entry
+
+    def store(self, key, depth, bound, score, move):
+        """
+        Store the result of searching a position.
+
+        Parameters:
+        - key (int): The Zobrist hash of the position.
+        - depth (int): The remaining depth the position was searched to.
+        - bound (int): EXACT, LOWER (score is a lower bound) or UPPER (score is an upper bound).
+        - score (int): The score from the side to move.
+        - move (chess.Move): The best move found, or None.
+        """
+        self.stores += 1
+        index = key % self.buckets
+        entry = (key, depth, bound, score, move, self.generation)
+        deep = self.deep[index]
+        if deep is None or deep[0] == key or depth >= deep[1] or deep[5] != self.generation:
+            self.deep[index] = entry
+        else:
+            self.recent[index] = entry
+
+    def stats(self):
+        """
+        Counters for monitoring the table.
+
+        Returns:
+        dict: Size, probe, hit and store counts and the hit rate.
+        """
+        return {
+            "size_mb": self.size_mb,
+            "buckets": self.buckets,
+            "probes": self.probes,
+            "hits": self.hits,
+            "stores": self.stores,
+            "hit_rate": self.hits / self.probes if self.probes else 0.0,
+        }
+
+
+def get_table():
+    """
+    Get the transposition table shared by all searches of this worker process.
+
+    Returns:
+    TranspositionTable: The table, sized by CHESS_TRANSPOSITION_TABLE_MB.
+    """
+    global _table
+    if _table is None:
+        with _lock:
+            if _table is None:
+                _table = TranspositionTable(settings.CHESS_TRANSPOSITION_TABLE_MB)
+    return _table
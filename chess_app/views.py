@@ -1,40 +1,224 @@
 import json
+import hashlib
+import functools
 import chess
-from django.shortcuts import render
-from django.http import JsonResponse
-from .utils import functions
-from .game import play
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse
+from django.middleware.csrf import get_token
+from django.template.loader import render_to_string
+from django.utils.http import quote_etag
+from django.views.decorators.http import condition
+from .utils import functions, instrumentation
+from .utils.instrumentation import instrument_view
+from .game import play_async
+from .engine import EngineBusy
+from .store import get_store
 
+# The game state of the starting position, shown by every new home page.
+start_state = functions.get_game_state(chess.Board())
+
+def get_game(data):
+    """
+    Get the stored game a request refers to, starting a new one if there is no game id.
+
+    An unknown or expired game id is only replaced by a new game when the client sent
+    the position it shows as 'curr_board', the new game then starts from there.
+
+    Parameters:
+    - data (dict): The decoded request body with an optional 'game_id' and an optional
+      'curr_board' FEN to start a new game from.
+
+    Returns:
+    Game: The game to play on, or None if the game id is unknown and no position was sent.
+
+    Raises:
+    ValueError: If 'curr_board' is not a valid position.
+    """
+    store = get_store()
+    fen = str(data['curr_board']) if data.get('curr_board') else None
+    if data.get('game_id'):
+        game = store.get(data['game_id'])
+        if game is not None or not fen:
+            return game
+    if fen and not chess.Board(fen).is_valid():
+        raise ValueError(f"Invalid position: {fen}")
+    return store.create(fen)
+
+def load_game(data, create=False):
+    """
+    Get the game of a request with get_game, or the error response to send instead.
+
+    Parameters:
+    - data (dict): The decoded request body, see get_game.
+    - create (bool): Start a new game instead of failing when the game id is unknown.
+
+    Returns:
+    tuple: The game and None, or None and a 400 (invalid position) or 404 (unknown game)
+           JsonResponse.
+    """
+    try:
+        game = get_game(data)
+    except ValueError:
+        return None, JsonResponse({'error': 'Invalid position.'}, status=400)
+    if game is None and create:
+        game = get_store().create()
+    if game is None:
+        return None, JsonResponse({'error': 'Unknown or expired game.'}, status=404)
+    return game, None
+
+def read_plies(data, key):
+    """
+    Read a number of half-moves from the request body.
+
+    Returns:
+    int: The number, or None if the key is missing.
+
+    Raises:
+    ValueError: If the value is not a non-negative integer.
+    """
+    value = data.get(key)
+    if value is None:
+        return None
+    if isinstance(value, bool) or not isinstance(value, (int, str)):
+        raise ValueError(f"Invalid {key}: {value!r}")
+    plies = int(value)
+    if plies < 0:
+        raise ValueError(f"Invalid {key}: {value!r}")
+    return plies
+
+def change_game(game, change, compact):
+    """
+    Apply an undo, redo or reset to a game and save it, unless play_step is making a
+    move on it. The game lock is only ever tried: play_step holds it while it awaits
+    the engine and the store, so waiting for it here in Django's shared sync thread
+    would block that save forever.
+
+    Parameters:
+    - game (Game): The game.
+    - change (callable): Changes the game, called with the lock held.
+    - compact (bool): Send the legal moves packed, see functions.get_game_state.
+
+    Returns:
+    JsonResponse: The game state after the change, or 409 if a move is in progress.
+    """
+    if not game.lock.acquire(blocking=False):
+        return JsonResponse({'error': 'A move is already in progress.'}, status=409)
+    try:
+        change()
+        get_store().save(game)
+        return game_response(game, compact=compact)
+    finally:
+        game.lock.release()
+
+def legal_move(board, uci):
+    """
+    Parse a move sent by the client, which must be legal on the board.
+
+    Returns:
+    chess.Move: The move, or None if it is malformed or not legal.
+    """
+    try:
+        move = chess.Move.from_uci(str(uci))
+    except ValueError:
+        return None
+    return move if move in board.legal_moves else None
+
+def game_response(game, game_state=None, compact=False):
+    """
+    Build the JSON response for a game, adding the game id and the undo/redo positions.
+    With `compact`, the legal moves are sent packed, see functions.get_game_state.
+    """
+    if game_state is None:
+        game_state = functions.get_game_state(game.board, compact=compact)
+    game_state['game_id'] = game.id
+    game_state['ply'] = len(game.board.move_stack)
+    game_state['can_undo'] = bool(game.board.move_stack) or game.discarded is not None
+    game_state['can_redo'] = bool(game.redo_stack)
+    return JsonResponse(game_state)
+
+@functools.lru_cache(maxsize=None)
+def home_page():
+    """
+    Render the home page once per process. It always shows the starting position and
+    holds nothing specific to the visitor, board.js reads the CSRF token from its cookie.
+
+    Returns:
+    tuple: The rendered HTML and its ETag.
+    """
+    context = dict(start_state, csrf_cookie_name=settings.CSRF_COOKIE_NAME)
+    content = render_to_string('chess_app/index.html', context)
+    return content, quote_etag(hashlib.md5(content.encode(), usedforsecurity=False).hexdigest())
+
+def home_etag(request):
+    # Without a CSRF cookie the page is sent again, so the cookie gets set
+    if settings.CSRF_COOKIE_NAME not in request.COOKIES:
+        return None
+    return home_page()[1]
+
+@condition(etag_func=home_etag)
 def home(request):
     """
     View function for rendering the home page of the chess application.
 
+    The page is rendered once and answered with 304 Not Modified when the browser
+    already has it, see home_page.
+
     Parameters:
     - request (HttpRequest): The HTTP request object.
 
     Returns:
-    HttpResponse: Rendered HTML page with the current game state.
+    HttpResponse: Rendered HTML page with the starting position.
     """
-    request.session['prev_state'] = ""
-    game_state = functions.get_game_state(chess.Board())
-    return render(request, 'chess_app/index.html', context=game_state)
+    get_token(request)
+    content, etag = home_page()
+    response = HttpResponse(content)
+    response['ETag'] = etag
+    response['Cache-Control'] = 'no-cache'
+    return response
 
-def play_step(request):
+@instrument_view
+async def play_step(request):
     """
     View function for processing a player's move and updating the game state.
 
+    The AI move is searched in the engine process pool while the view waits without
+    blocking the event loop. With 'compact' set in the body, the legal moves are sent
+    packed (see functions.get_game_state), as for reset_game, undo_move and redo_move.
+    With 'parallel' set, a minimax search is split over all engine processes.
+
     Parameters:
     - request (HttpRequest): The HTTP request object.
 
     Returns:
-    JsonResponse: JSON response containing the updated game state after the player's move.
+    JsonResponse: JSON response containing the updated game state after the player's move,
+    400 if the move is not legal, 404 if the game is unknown, 409 if a move is already in
+    progress for the game or 503 if the engine is saturated.
     """
-    board = chess.Board(json.loads(request.body).get('curr_board'))
-    move = json.loads(request.body).get('move')
-    model = json.loads(request.body).get('model')
-    request.session['prev_state'] = board.fen()
-    game_state = play(move, board, model)
-    return JsonResponse(game_state)
+    with instrumentation.stage("load"):
+        data = json.loads(request.body)
+        game, error = await sync_to_async(load_game)(data)
+    if error:
+        return error
+    if not game.lock.acquire(blocking=False):
+        return JsonResponse({'error': 'A move is already in progress.'}, status=409)
+    try:
+        move = legal_move(game.board, data.get('move'))
+        if move is None:
+            return JsonResponse({'error': 'Illegal move.'}, status=400)
+        try:
+            game_state = await play_async(move.uci(), game.board, data.get('model'),
+                                          bool(data.get('compact')), bool(data.get('parallel')))
+        except EngineBusy:
+            response = JsonResponse({'error': 'The chess engine is busy, try again.'}, status=503)
+            response['Retry-After'] = '1'
+            return response
+        game.redo_stack.clear()
+        with instrumentation.stage("save"):
+            await sync_to_async(get_store().save)(game)
+        return game_response(game, game_state)
+    finally:
+        game.lock.release()
 
 def reset_game(request):
     """
@@ -44,17 +228,64 @@ def reset_game(request):
     - request (HttpRequest): The HTTP request object.
 
     Returns:
-    JsonResponse: JSON response containing the updated game state after resetting the game.
+    JsonResponse: JSON response containing the updated game state after resetting the game,
+    400 if the position sent is not valid or 409 if a move is in progress.
     """
-    board = chess.Board(json.loads(request.body).get('curr_board'))
-    request.session['prev_state'] = board.fen()
-    game_state = functions.get_game_state(chess.Board())
-    return JsonResponse(game_state)
+    data = json.loads(request.body)
+    game, error = load_game(data, create=True)
+    if error:
+        return error
+    return change_game(game, game.reset, bool(data.get('compact')))
 
 def undo_move(request):
-    prev_state = request.session['prev_state']
-    board = chess.Board(json.loads(request.body).get('curr_board'))
-    if prev_state != "":
-        board = chess.Board(prev_state)
-    game_state = functions.get_game_state(board)
-    return JsonResponse(game_state)
+    """
+    View function for taking back moves from the stored move stack.
+
+    Parameters:
+    - request (HttpRequest): The HTTP request object. The body may contain 'plies', the
+      number of half-moves to take back, or 'ply', the ply to go back to. Without either,
+      the last human move and the AI reply are taken back.
+
+    Returns:
+    JsonResponse: JSON response containing the game state after taking the moves back,
+    400 if the position or the number of plies sent is not valid, 404 if the game is
+    unknown or 409 if a move is in progress.
+    """
+    data = json.loads(request.body)
+    try:
+        ply, plies = read_plies(data, 'ply'), read_plies(data, 'plies')
+    except ValueError:
+        return JsonResponse({'error': 'Invalid number of plies.'}, status=400)
+    game, error = load_game(data)
+    if error:
+        return error
+    if ply is not None:
+        change = functools.partial(game.go_to, ply)
+    else:
+        change = functools.partial(game.undo, plies or None)
+    return change_game(game, change, bool(data.get('compact')))
+
+def redo_move(request):
+    """
+    View function for replaying moves taken back by undo_move.
+
+    Parameters:
+    - request (HttpRequest): The HTTP request object. The body may contain 'plies', the
+      number of half-moves to replay. Without it, moves are replayed up to the human
+      player's next turn.
+
+    Returns:
+    JsonResponse: JSON response containing the game state after replaying the moves,
+    400 if the position or the number of plies sent is not valid, 404 if the game is
+    unknown or 409 if a move is in progress.
+    """
+    data = json.loads(request.body)
+    try:
+        plies = read_plies(data, 'plies')
+    except ValueError:
+        return JsonResponse({'error': 'Invalid number of plies.'}, status=400)
+    game, error = load_game(data)
+    if error:
+        return error
+    return change_game(game, functools.partial(game.redo, plies or None),
+                       bool(data.get('compact')))
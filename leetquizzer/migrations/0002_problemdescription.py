@@ -0,0 +1,35 @@
+# Generated by Django 4.2.4 on 2026-10-18 03:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("leetquizzer", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProblemDescription",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("slug", models.CharField(max_length=150, unique=True)),
+                ("content", models.TextField(blank=True, default="")),
+                (
+                    "content_hash",
+                    models.CharField(blank=True, default="", max_length=64),
+                ),
+                ("fetched_at", models.DateTimeField(blank=True, null=True)),
+                ("checked_at", models.DateTimeField()),
+            ],
+        ),
+    ]
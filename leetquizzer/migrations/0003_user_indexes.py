@@ -0,0 +1,54 @@
+# Generated by Django 4.2.4 on 2026-10-18 03:02
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def remove_duplicates(apps, schema_editor):
+    """
+    Merge the rows the new unique constraints would reject. Problems of a duplicated
+    topic name are moved to the oldest topic of that name, and of the problems sharing
+    a number only the most recently updated one is kept.
+    """
+    Problem = apps.get_model("leetquizzer", "Problem")
+    Topic = apps.get_model("leetquizzer", "Topic")
+    duplicates = (Topic.objects.values("user", "name").annotate(count=Count("id"))
+                  .filter(count__gt=1))
+    for duplicate in duplicates:
+        topics = Topic.objects.filter(user=duplicate["user"], name=duplicate["name"]).order_by("id")
+        kept, extra = topics[0], topics[1:]
+        Problem.objects.filter(topic__in=extra).update(topic=kept)
+        Topic.objects.filter(pk__in=[topic.pk for topic in extra]).delete()
+    duplicates = (Problem.objects.values("user", "number").annotate(count=Count("id"))
+                  .filter(count__gt=1))
+    for duplicate in duplicates:
+        problems = Problem.objects.filter(user=duplicate["user"], number=duplicate["number"])
+        kept = problems.order_by("-time", "-id")[0]
+        problems.exclude(pk=kept.pk).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("leetquizzer", "0002_problemdescription"),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicates, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="problem",
+            index=models.Index(fields=["user", "time"], name="problem_user_time_idx"),
+        ),
+        migrations.AddConstraint(
+            model_name="problem",
+            constraint=models.UniqueConstraint(
+                fields=("user", "number"), name="unique_problem_number_per_user"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="topic",
+            constraint=models.UniqueConstraint(
+                fields=("user", "name"), name="unique_topic_name_per_user"
+            ),
+        ),
+    ]
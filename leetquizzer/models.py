@@ -15,6 +15,11 @@ class Topic(models.Model):
     name = models.CharField(max_length=20)
     user = models.ForeignKey(User, on_delete=models.CASCADE)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'name'], name='unique_topic_name_per_user'),
+        ]
+
     def __str__(self):
         return f"{self.name}"
 
@@ -62,5 +67,35 @@ class Problem(models.Model):
     option2 = models.TextField(max_length=300, blank=True, null=True)
     edge_case = models.TextField(max_length=300, blank=True, null=True)
 
+    class Meta:
+        # The unique (user, number) index also serves the plain per-user lookups
+        indexes = [
+            models.Index(fields=['user', 'time'], name='problem_user_time_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'number'], name='unique_problem_number_per_user'),
+        ]
+
     def __str__(self):
         return f"{self.number}. {self.name}"
+
+
+class ProblemDescription(models.Model):
+    """
+    Model caching the LeetCode description of a problem, shared by every user's copy of it.
+
+    Attributes:
+        slug (str): The LeetCode title slug, stored as Problem.link.
+        content (str): The HTML description, empty until it was fetched once.
+        content_hash (str): SHA-256 of the content, to tell whether a refresh changed it.
+        fetched_at (datetime): When the content was last fetched successfully.
+        checked_at (datetime): When LeetCode was last asked, successfully or not.
+    """
+    slug = models.CharField(max_length=150, unique=True)
+    content = models.TextField(blank=True, default='')
+    content_hash = models.CharField(max_length=64, blank=True, default='')
+    fetched_at = models.DateTimeField(blank=True, null=True)
+    checked_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.slug}"
@@ -0,0 +1,128 @@
+var loadMore = document.getElementById('load-more');
+var problemRows = document.getElementById('problem-rows');
+var loading = false;
+var observer = null;
+
+function element(tag, className, text) {
+    var node = document.createElement(tag);
+    if (className) {
+        node.className = className;
+    }
+    if (text !== undefined) {
+        node.textContent = text;
+    }
+    return node;
+}
+
+function link(href, className, text) {
+    var node = element('a', className, text);
+    node.href = href;
+    return node;
+}
+
+function icon(name) {
+    return element('i', 'bi ' + name);
+}
+
+function problemRow(problem) {
+    var row = element('tr', problem.wrong ? 'table-danger' : '');
+    row.appendChild(element('td', 'd-none d-md-table-cell', problem.number));
+
+    var name = link(problem.url, 'link-dark link-underline-opacity-0', problem.name);
+    name.style.display = 'block';
+    row.appendChild(element('td')).appendChild(name);
+
+    var leetcode = link('https://leetcode.com/problems/' + problem.link + '/', 'link-dark');
+    leetcode.title = 'LeetCode';
+    leetcode.appendChild(icon('bi-box-arrow-up-right'));
+    row.appendChild(element('td', 'd-none d-md-table-cell')).appendChild(leetcode);
+
+    var topic = link(problem.topic_url, 'link-dark link-underline-opacity-0', problem.topic);
+    topic.style.display = 'block';
+    row.appendChild(element('td')).appendChild(topic);
+    row.appendChild(element('td', '', problem.difficulty));
+
+    var actions = element('div', 'container d-flex justify-content-end align-items-center');
+    var update = link(problem.update_url, 'link-dark px-2');
+    update.title = 'Update Problem';
+    update.appendChild(icon('bi-gear'));
+    actions.appendChild(update);
+    actions.appendChild(deleteForm(problem.delete_url));
+    row.appendChild(element('td', 'd-none d-md-table-cell')).appendChild(actions);
+    return row;
+}
+
+function deleteForm(url) {
+    var form = element('form');
+    form.action = url;
+    form.method = 'post';
+    form.onsubmit = function () {
+        return confirm('Are you sure about this ?');
+    };
+    var token = element('input');
+    token.type = 'hidden';
+    token.name = 'csrfmiddlewaretoken';
+    token.value = document.querySelector('[name=csrfmiddlewaretoken]').value;
+    form.appendChild(token);
+    var button = element('button', 'bg-transparent border-0 p-0');
+    button.name = 'delete';
+    button.value = 'delete';
+    button.title = 'Delete Problem';
+    button.appendChild(icon('bi-trash3'));
+    form.appendChild(button);
+    return form;
+}
+
+function loadPage() {
+    if (loading || !loadMore.dataset.cursor) {
+        return;
+    }
+    loading = true;
+    loadMore.disabled = true;
+    var params = new URLSearchParams({cursor: loadMore.dataset.cursor});
+    if (loadMore.dataset.sort) {
+        params.set('sort', loadMore.dataset.sort);
+    }
+    fetch(loadMore.dataset.url + '?' + params)
+        .then(function (response) {
+            if (!response.ok) {
+                throw new Error(response.statusText);
+            }
+            return response.json();
+        })
+        .then(function (page) {
+            var rows = document.createDocumentFragment();
+            page.problems.forEach(function (problem) {
+                rows.appendChild(problemRow(problem));
+            });
+            problemRows.appendChild(rows);
+            loadMore.dataset.cursor = page.next || '';
+            loadMore.textContent = 'Load more';
+            if (!page.next) {
+                loadMore.parentNode.remove();
+            } else if (observer) {
+                // Observe again, so a page that did not fill the screen is followed by the next
+                observer.unobserve(loadMore);
+                observer.observe(loadMore);
+            }
+        })
+        .catch(function () {
+            loadMore.textContent = 'Retry';
+        })
+        .finally(function () {
+            loading = false;
+            loadMore.disabled = false;
+        });
+}
+
+loadMore.addEventListener('click', loadPage);
+
+// Load the next page before the end of the table scrolls into view
+if ('IntersectionObserver' in window) {
+    observer = new IntersectionObserver(function (entries) {
+        if (entries[0].isIntersecting) {
+            loadPage();
+        }
+    }, {rootMargin: '400px'});
+    observer.observe(loadMore);
+}
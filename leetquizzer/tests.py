@@ -0,0 +1,405 @@
+"""
+LeetQuizzer application tests.
+"""
+import json
+import time
+import base64
+import threading
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
+from leetquizzer.models import Difficulty, Problem, ProblemDescription, Topic
+from leetquizzer.utils import functions
+
+
+class StubLeetCode(BaseHTTPRequestHandler):
+    """
+    Stand-in for the LeetCode GraphQL endpoint, answering every query with the
+    description, status and delay set on the server.
+    """
+
+    def do_POST(self):
+        server = self.server
+        self.rfile.read(int(self.headers['Content-Length']))
+        server.queries += 1
+        server.release.wait(5)
+        try:
+            self.respond(server)
+        except ConnectionError:
+            # The client gave up waiting, as after a read timeout
+            pass
+
+    def respond(self, server):
+        if server.status != 200:
+            self.send_response(server.status)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        body = json.dumps({'data': {'question': {'content': server.content}}}).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class StubLeetCodeMixin:
+    """
+    Runs a StubLeetCode server for the tests of the class and points the LeetCode
+    queries at it, with a closed circuit breaker for every test.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), StubLeetCode)
+        cls.server.release = threading.Event()
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        super().setUp()
+        self.server.queries = 0
+        self.server.status = 200
+        self.server.content = '<p>Find two numbers adding up to the target.</p>'
+        self.server.release.set()
+        functions.breaker.record_success()
+        patcher = mock.patch.object(functions, 'LEETCODE_URL',
+                                    f'http://127.0.0.1:{self.server.server_port}/')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.server.release.set)
+
+
+class ProblemDescriptionTests(StubLeetCodeMixin, TransactionTestCase):
+    """
+    The problem page serves descriptions from the local cache, refreshed from a stub
+    LeetCode server in the background. A TransactionTestCase, so the refresh thread
+    sees the rows created by the test.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('tester', password='password')
+        self.client.force_login(self.user)
+        topic = Topic.objects.create(name='Array', user=self.user)
+        difficulty = Difficulty.objects.create(name='Easy')
+        self.problem = Problem.objects.create(name='Two Sum', user=self.user, number=1,
+                                              link='two-sum', topic=topic,
+                                              difficulty=difficulty, solution='Hash map')
+        self.url = reverse('leetquizzer:problem_menu', args=[self.problem.pk])
+
+    def cache_description(self, content, age):
+        checked_at = timezone.now() - age
+        ProblemDescription.objects.create(slug='two-sum', content=content,
+                                          fetched_at=checked_at, checked_at=checked_at)
+
+    def wait_for_refresh(self):
+        deadline = time.monotonic() + 10
+        while functions.refreshing:
+            self.assertLess(time.monotonic(), deadline, 'The refresh did not finish')
+            time.sleep(0.01)
+
+    def test_repeated_views_query_leetcode_once(self):
+        for _ in range(3):
+            response = self.client.get(self.url)
+            self.assertContains(response, 'Find two numbers adding up to the target.')
+        self.assertEqual(self.server.queries, 1)
+
+    def test_stale_description_served_during_refresh(self):
+        self.cache_description('<p>Old statement</p>', timedelta(days=8))
+        self.server.content = '<p>New statement</p>'
+        self.server.release.clear()
+
+        response = self.client.get(self.url)
+        self.assertContains(response, 'Old statement')
+        self.assertTrue(functions.refreshing)
+
+        self.server.release.set()
+        self.wait_for_refresh()
+        self.assertEqual(self.server.queries, 1)
+        self.assertContains(self.client.get(self.url), 'New statement')
+
+    def test_cached_description_served_while_leetcode_down(self):
+        self.cache_description('<p>Cached statement</p>', timedelta(days=8))
+        self.server.status = 503
+
+        with self.assertLogs('leetquizzer', 'WARNING'):
+            response = self.client.get(self.url)
+            self.assertContains(response, 'Cached statement')
+            self.wait_for_refresh()
+        description = ProblemDescription.objects.get(slug='two-sum')
+        self.assertEqual(description.content, '<p>Cached statement</p>')
+        self.assertLess(timezone.now() - description.checked_at, timedelta(minutes=1))
+        self.assertContains(self.client.get(self.url), 'Cached statement')
+
+    def test_fallback_link_without_description(self):
+        self.server.status = 503
+
+        with self.assertLogs('leetquizzer', 'WARNING'):
+            response = self.client.get(self.url)
+        self.assertContains(response, 'The description is not available right now')
+        self.assertContains(response, 'href="https://leetcode.com/problems/two-sum/"')
+
+
+class LeetCodeQueryTests(StubLeetCodeMixin, SimpleTestCase):
+    """
+    LeetCode queries go through a circuit breaker, which opens after a number of failed
+    queries, fails fast while open and then lets a single trial query through. Hung
+    reads are not retried.
+    """
+    query = {'query': 'question', 'variables': {'titleSlug': 'two-sum'}}
+
+    def setUp(self):
+        super().setUp()
+        self.breaker = functions.CircuitBreaker(threshold=2, cooldown=60)
+        patcher = mock.patch.object(functions, 'breaker', self.breaker)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def expire_cooldown(self):
+        self.breaker.opened_at -= self.breaker.cooldown
+
+    def test_breaker_opens_after_threshold(self):
+        # Not retried, so every query reaches the server once
+        self.server.status = 403
+        with self.assertLogs('leetquizzer', 'WARNING') as logs:
+            for _ in range(2):
+                self.assertEqual(functions.send_query(self.query), {})
+        self.assertEqual(len(logs.records), 2)
+        self.assertEqual(self.server.queries, 2)
+
+        self.server.status = 200
+        self.assertEqual(functions.send_query(self.query), {})
+        self.assertEqual(self.server.queries, 2)
+
+    def test_success_closes_breaker(self):
+        self.server.status = 403
+        with self.assertLogs('leetquizzer', 'WARNING'):
+            functions.send_query(self.query)
+        self.server.status = 200
+        self.assertEqual(functions.send_query(self.query), {'content': self.server.content})
+        self.assertEqual(self.breaker.failures, 0)
+
+    def test_half_open_allows_single_trial(self):
+        self.server.status = 403
+        with self.assertLogs('leetquizzer', 'WARNING'):
+            for _ in range(2):
+                functions.send_query(self.query)
+        self.expire_cooldown()
+        self.server.status = 200
+        self.server.release.clear()
+
+        trial = threading.Thread(target=functions.send_query, args=(self.query,))
+        trial.start()
+        deadline = time.monotonic() + 5
+        while self.server.queries < 3:
+            self.assertLess(time.monotonic(), deadline, 'The trial query was not sent')
+            time.sleep(0.01)
+        self.assertEqual(functions.send_query(self.query), {})
+        self.server.release.set()
+        trial.join()
+        self.assertEqual(self.server.queries, 3)
+
+        self.assertEqual(functions.send_query(self.query), {'content': self.server.content})
+        self.assertEqual(self.server.queries, 4)
+
+    def test_failed_trial_reopens_breaker(self):
+        self.server.status = 403
+        with self.assertLogs('leetquizzer', 'WARNING'):
+            for _ in range(2):
+                functions.send_query(self.query)
+            self.expire_cooldown()
+            functions.send_query(self.query)
+        self.assertEqual(self.server.queries, 3)
+        self.assertEqual(functions.send_query(self.query), {})
+        self.assertEqual(self.server.queries, 3)
+
+    @mock.patch.object(functions, 'LEETCODE_TIMEOUT', 0.2)
+    def test_read_timeout_is_not_retried(self):
+        self.server.release.clear()
+        start = time.monotonic()
+        with self.assertLogs('leetquizzer', 'WARNING'):
+            self.assertEqual(functions.send_query(self.query), {})
+        self.assertLess(time.monotonic() - start, 1)
+        self.assertEqual(self.server.queries, 1)
+        self.assertEqual(self.breaker.failures, 1)
+
+
+class MainMenuTests(TestCase):
+    """
+    The problem list loads the problems with their topics and difficulties in a single
+    query, so the number of queries does not grow with the number of problems.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user('tester', password='password')
+        self.client.force_login(self.user)
+        self.topics = [Topic.objects.create(name=f'Topic {i}', user=self.user) for i in range(3)]
+        self.difficulties = [Difficulty.objects.create(name=name) for name in ('Easy', 'Hard')]
+
+    def add_problems(self, count):
+        for number in range(Problem.objects.count(), count):
+            Problem.objects.create(name=f'Problem {number}', user=self.user, number=number,
+                                   link=f'problem-{number}', topic=self.topics[number % 3],
+                                   difficulty=self.difficulties[number % 2], solution='Solution')
+
+    def test_query_count_does_not_grow_with_problems(self):
+        for count in (1, 40):
+            self.add_problems(count)
+            for sorted_by in (None, 'topic__name', '-difficulty__name'):
+                url = reverse('leetquizzer:main_menu', args=[sorted_by] if sorted_by else [])
+                # The session, the user and the problem list
+                with self.assertNumQueries(3):
+                    response = self.client.get(url)
+                self.assertEqual(len(response.context['problem_list']), count)
+                self.assertContains(response, 'Topic 0')
+                self.assertContains(response, 'Easy')
+
+
+class ProblemListTests(TestCase):
+    """
+    Paging through the problem list with the cursors returns every problem once, in the
+    same order as the whole list, for every sort order, including problems that share
+    the sort value.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user('tester', password='password')
+        self.client.force_login(self.user)
+        topics = [Topic.objects.create(name=f'Topic {i}', user=self.user) for i in range(3)]
+        difficulties = [Difficulty.objects.create(name=name) for name in ('Easy', 'Hard')]
+        now = timezone.now()
+        for number in range(1, 18):
+            problem = Problem.objects.create(name=f'Problem {number}', user=self.user,
+                                             number=number, link=f'problem-{number}',
+                                             topic=topics[number % 3],
+                                             difficulty=difficulties[number % 2],
+                                             solution='Solution')
+            # auto_now is bypassed by update(), several problems share each time
+            Problem.objects.filter(pk=problem.pk).update(
+                time=now - timedelta(minutes=number % 4, microseconds=number % 2))
+
+    def test_pages_match_the_full_order(self):
+        for field in functions.SORT_FIELDS:
+            for sorted_by in (field, f'-{field}'):
+                expected = [problem.pk for problem in Problem.objects.filter(user=self.user)
+                            .order_by(sorted_by, '-pk' if sorted_by.startswith('-') else 'pk')]
+                paged, cursor = [], None
+                for _ in range(len(expected)):
+                    problems, cursor = functions.get_problem_page(self.user, sorted_by, cursor,
+                                                                  size=4)
+                    paged += [problem.pk for problem in problems]
+                    if cursor is None:
+                        break
+                self.assertEqual(paged, expected, sorted_by)
+
+    def test_invalid_sort_and_cursor(self):
+        url = reverse('leetquizzer:problem_list')
+        bad_cursor = base64.urlsafe_b64encode(b'["x","y"]').decode('ascii')
+        for params, message in (({'sort': 'solution'}, 'Invalid sort'),
+                                ({'sort': '--time'}, 'Invalid sort'),
+                                ({'sort': 'number', 'cursor': bad_cursor}, 'Invalid cursor'),
+                                ({'cursor': 'not base64!'}, 'Invalid cursor'),
+                                ({'cursor': bad_cursor}, 'Invalid cursor')):
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json(), {'error': message})
+
+
+def index_names(table, columns):
+    """
+    Names of the indexes on exactly the given columns. On SQLite a unique constraint is
+    enforced by an automatic index named after the table, which introspection does not
+    list, so those are looked up as well.
+    """
+    with connection.cursor() as cursor:
+        constraints = connection.introspection.get_constraints(cursor, table)
+        names = {name for name, constraint in constraints.items() if constraint['columns'] == columns}
+        if connection.vendor == 'sqlite':
+            cursor.execute(f'PRAGMA index_list({table})')
+            for index in [row[1] for row in cursor.fetchall()]:
+                cursor.execute(f'PRAGMA index_info({index})')
+                if [row[2] for row in cursor.fetchall()] == columns:
+                    names.add(index)
+    return names
+
+
+class IndexTests(TestCase):
+    """
+    The per-user problem and topic lookups use the composite indexes, and duplicates are
+    rejected by the unique constraints instead of a separate exists() query.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user('tester', password='password')
+        self.client.force_login(self.user)
+        self.topic = Topic.objects.create(name='Array', user=self.user)
+        self.difficulty = Difficulty.objects.create(name='Easy')
+
+    def assertUsesIndex(self, queryset, table, columns):
+        names = index_names(table, columns)
+        self.assertTrue(names, f'No index on {table} {columns}')
+        plan = queryset.explain()
+        self.assertTrue(any(name in plan for name in names), f'{plan} does not use any of {names}')
+
+    def test_per_user_list_uses_user_time_index(self):
+        self.assertIn('problem_user_time_idx',
+                      index_names('leetquizzer_problem', ['user_id', 'time']))
+        self.assertUsesIndex(Problem.objects.filter(user=self.user).order_by('time'),
+                             'leetquizzer_problem', ['user_id', 'time'])
+
+    def test_number_lookup_uses_unique_index(self):
+        self.assertUsesIndex(Problem.objects.filter(user=self.user, number=1),
+                             'leetquizzer_problem', ['user_id', 'number'])
+
+    def test_topic_lookup_uses_unique_index(self):
+        self.assertUsesIndex(Topic.objects.filter(user=self.user, name='Array'),
+                             'leetquizzer_topic', ['user_id', 'name'])
+
+    def test_duplicate_topic_is_rejected(self):
+        response = self.client.post(reverse('leetquizzer:create_topic'), {'topic': 'array'})
+        self.assertContains(response, 'Topic with this name already exists!')
+        self.assertEqual(Topic.objects.filter(user=self.user).count(), 1)
+
+    def test_topic_renamed_to_existing_name_is_rejected(self):
+        graph = Topic.objects.create(name='Graph', user=self.user)
+        response = self.client.post(reverse('leetquizzer:update_topic', args=[graph.pk]),
+                                    {'topic': 'array'})
+        self.assertContains(response, 'Topic with this name already exists!')
+        graph.refresh_from_db()
+        self.assertEqual(graph.name, 'Graph')
+
+    def test_same_topic_name_for_another_user_is_allowed(self):
+        other = User.objects.create_user('other', password='password')
+        Topic.objects.create(name='Graph', user=other)
+        response = self.client.post(reverse('leetquizzer:create_topic'), {'topic': 'graph'})
+        self.assertRedirects(response, reverse('leetquizzer:main_menu'))
+
+    @mock.patch('leetquizzer.views.refresh_description')
+    @mock.patch('leetquizzer.views.get_problem_info')
+    def test_duplicate_problem_is_rejected(self, get_problem_info, refresh_description):
+        get_problem_info.return_value = {'questionFrontendId': '1', 'title': 'Two Sum',
+                                         'difficulty': 'Easy'}
+        data = {'link': 'https://leetcode.com/problems/two-sum/', 'topic': self.topic.pk,
+                'solution': 'Hash map'}
+        response = self.client.post(reverse('leetquizzer:create_problem'), data)
+        self.assertRedirects(response, reverse('leetquizzer:main_menu'))
+
+        response = self.client.post(reverse('leetquizzer:create_problem'), data)
+        self.assertContains(response, 'Problem already exists!')
+        self.assertEqual(Problem.objects.filter(user=self.user).count(), 1)
+        refresh_description.assert_called_once_with('two-sum')
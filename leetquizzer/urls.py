@@ -8,6 +8,7 @@ app_name = 'leetquizzer'
 urlpatterns = [
     path('', views.MainMenu.as_view(), name='main_menu'),
     path('<str:sorted_by>/', views.MainMenu.as_view(), name='main_menu'),
+    path('problem/list/', views.ProblemList.as_view(), name='problem_list'),
     path('problem/<int:problem_id>/', views.ProblemMenu.as_view(), name='problem_menu'),
     path('problem/<int:problem_id>/update_problem/', views.UpdateProblem.as_view(), name='update_problem'),
     path('problem/<int:problem_id>/delete_problem/', views.DeleteProblem.as_view(), name='delete_problem'),
@@ -1,10 +1,125 @@
 """
 All utility functions used by leetquizzer application's views.py
 """
-import ast
+import json
+import time
+import base64
+import logging
+import hashlib
+import threading
+from datetime import datetime
 import requests
-from requests.exceptions import ReadTimeout
-from website.settings import LEETCODE_URL
+from requests.adapters import HTTPAdapter
+from requests.exceptions import RequestException
+from urllib3.util import Retry
+from django.db import connection
+from django.db.models import Q
+from django.utils import timezone
+from leetquizzer.models import Problem, ProblemDescription
+from website.settings import LEETCODE_URL, LEETCODE_DESCRIPTION_TTL, LEETCODE_RETRY_SECONDS
+from website.settings import LEETCODE_TIMEOUT, LEETCODE_CONNECT_TIMEOUT, LEETCODE_RETRIES
+from website.settings import LEETCODE_BREAKER_THRESHOLD, LEETCODE_BREAKER_COOLDOWN
+from website.settings import LEETQUIZZER_PAGE_SIZE
+
+logger = logging.getLogger(__name__)
+
+refreshing = set()
+refresh_lock = threading.Lock()
+
+# Columns the problem list can be sorted by, with the parser of their cursor values
+SORT_FIELDS = {
+    'time': datetime.fromisoformat,
+    'number': int,
+    'topic__name': str,
+    'difficulty__name': str,
+}
+# Only the columns shown in the problem table, topics and difficulties are joined in
+LIST_FIELDS = ('number', 'name', 'link', 'wrong', 'time', 'topic__name', 'difficulty__name')
+
+
+class InvalidSort(ValueError):
+    """
+    The problem list was asked to sort by a field that is not one of SORT_FIELDS.
+    """
+
+
+class InvalidCursor(ValueError):
+    """
+    The problem list was given a cursor that was not made by encode_cursor.
+    """
+
+
+class CircuitBreaker:
+    """
+    Stops calling a service that keeps failing, so requests fail fast instead of each
+    waiting for a timeout.
+
+    After `threshold` failures in a row the breaker opens and allow() refuses calls for
+    `cooldown` seconds. Then a single trial call is let through, its success closes the
+    breaker and its failure opens it for another cooldown.
+
+    Attributes:
+        threshold (int): The number of failures in a row that opens the breaker.
+        cooldown (float): The seconds calls are refused once the breaker opened.
+    """
+
+    def __init__(self, threshold, cooldown):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.trial = False
+        self.lock = threading.Lock()
+
+    def allow(self):
+        """
+        Check whether a call may be made now.
+        """
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if self.trial or time.monotonic() - self.opened_at < self.cooldown:
+                return False
+            self.trial = True
+            return True
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.trial or self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+            self.trial = False
+
+
+def create_session():
+    """
+    Create the HTTP session shared by all LeetCode queries.
+
+    The session keeps connections to LeetCode alive between queries. Failed connections,
+    rate limits and server errors are retried LEETCODE_RETRIES times with exponential
+    backoff and random jitter. Retry-After is ignored, urllib3 would sleep for as long as
+    it says. Read errors are never retried, so a hung LeetCode holds a request for one
+    LEETCODE_TIMEOUT at most, as without retries. The GraphQL queries only read, so their
+    POST requests are safe to retry.
+    """
+    retry = Retry(total=LEETCODE_RETRIES, read=0, backoff_factor=0.5, backoff_jitter=0.5,
+                  status_forcelist=(429, 500, 502, 503, 504), allowed_methods=('POST',),
+                  respect_retry_after_header=False)
+    adapter = HTTPAdapter(pool_maxsize=10, max_retries=retry)
+    new_session = requests.Session()
+    new_session.mount('https://', adapter)
+    new_session.mount('http://', adapter)
+    return new_session
+
+
+session = create_session()
+breaker = CircuitBreaker(LEETCODE_BREAKER_THRESHOLD, LEETCODE_BREAKER_COOLDOWN)
 
 
 def get_question_list(problem):
@@ -26,18 +141,28 @@ def get_question_list(problem):
 def send_query(query):
     """
     Sends a query to graphql server of leetcode. If response is valid, returns response else
-    returns an empty dictionary.
+    returns an empty dictionary. Only a valid response counts as a success for the circuit
+    breaker, which returns an empty dictionary without sending the query while LeetCode
+    is failing.
     """
+    if not breaker.allow():
+        return {}
+    try:
+        response = session.post(url=LEETCODE_URL, json=query,
+                                timeout=(LEETCODE_CONNECT_TIMEOUT, LEETCODE_TIMEOUT))
+        response.raise_for_status()
+    except RequestException as error:
+        breaker.record_failure()
+        logger.warning("LeetCode query failed: %s", error)
+        return {}
     try:
-        response = requests.post(url=LEETCODE_URL, json=query, timeout=5)
-        if response.status_code == 200:
-            response_dict = ast.literal_eval(response.content.decode('utf-8'))
-            return response_dict['data']['question']
-    except ReadTimeout:
-        print("Timeout")
-    except ValueError:
-        print("Error decoding response")
-    return {}
+        question = response.json()['data']['question']
+    except (ValueError, KeyError, TypeError):
+        breaker.record_failure()
+        logger.warning("Error decoding the LeetCode response")
+        return {}
+    breaker.record_success()
+    return question or {}
 
 
 def get_problem_info(title_slug):
@@ -86,6 +211,156 @@ def get_problem_desc(title_slug):
     return send_query(description_query)
 
 
+def fetch_description(title_slug):
+    """
+    Fetch a problem description from LeetCode and store it in the local cache.
+
+    The content is only rewritten when its hash changed. If LeetCode can not be reached,
+    the stored content is kept and only the time of the attempt is recorded.
+
+    Args:
+        title_slug (str): The title slug of the question.
+
+    Returns:
+        ProblemDescription: The cached description.
+    """
+    now = timezone.now()
+    content = (get_problem_desc(title_slug) or {}).get('content')
+    description, _ = ProblemDescription.objects.get_or_create(
+        slug=title_slug, defaults={'checked_at': now})
+    description.checked_at = now
+    if content:
+        description.fetched_at = now
+        content_hash = hashlib.sha256(content.encode('utf-8')).hexdigest()
+        if content_hash != description.content_hash:
+            description.content = content
+            description.content_hash = content_hash
+    description.save()
+    return description
+
+
+def refresh_description(title_slug):
+    """
+    Fetch a problem description in a background thread, unless it is already being fetched.
+    """
+    with refresh_lock:
+        if title_slug in refreshing:
+            return
+        refreshing.add(title_slug)
+
+    def run():
+        try:
+            fetch_description(title_slug)
+        finally:
+            with refresh_lock:
+                refreshing.discard(title_slug)
+            connection.close()
+
+    threading.Thread(target=run, daemon=True).start()
+
+
+def get_description(title_slug):
+    """
+    Get a problem description from the local cache.
+
+    Only the first view of a problem waits for LeetCode. Later views are served from
+    the cache, which is refreshed in the background once it is older than
+    LEETCODE_DESCRIPTION_TTL, or LEETCODE_RETRY_SECONDS while it could not be fetched.
+
+    Args:
+        title_slug (str): The title slug of the question.
+
+    Returns:
+        str: The HTML description, empty if it could not be fetched yet.
+    """
+    description = ProblemDescription.objects.filter(slug=title_slug).first()
+    if description is None:
+        return fetch_description(title_slug).content
+    ttl = LEETCODE_DESCRIPTION_TTL if description.fetched_at else LEETCODE_RETRY_SECONDS
+    if (timezone.now() - description.checked_at).total_seconds() > ttl:
+        refresh_description(title_slug)
+    return description.content
+
+
+def encode_cursor(problem, field):
+    """
+    Encode the position of a problem in a list sorted by a field as an opaque cursor.
+
+    Args:
+        problem (Problem): The last problem of a page.
+        field (str): The sort field without its '-' prefix, one of SORT_FIELDS.
+
+    Returns:
+        str: The URL-safe cursor of the next page.
+    """
+    value = problem
+    for name in field.split('__'):
+        value = getattr(value, name)
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    cursor = json.dumps([value, problem.pk], separators=(',', ':'))
+    return base64.urlsafe_b64encode(cursor.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor, field):
+    """
+    Decode a cursor made by encode_cursor for the same sort field.
+
+    Returns:
+        tuple: The sort value and primary key of the last problem of the previous page.
+
+    Raises:
+        InvalidCursor: If the cursor is malformed.
+    """
+    try:
+        value, pk = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return SORT_FIELDS[field](value), int(pk)
+    except (TypeError, ValueError, UnicodeError) as error:
+        raise InvalidCursor("Invalid cursor") from error
+
+
+def get_problem_page(user, sorted_by=None, cursor=None, size=LEETQUIZZER_PAGE_SIZE):
+    """
+    Get one page of a user's problems with keyset pagination.
+
+    The problems are ordered by the sort field and then by primary key, so problems with
+    the same value keep a stable order. The next page starts after the last problem of
+    the previous one instead of at an offset, so it costs the same however deep the list
+    is and does not skip or repeat problems when problems are added in between.
+
+    Args:
+        user (User): The owner of the problems.
+        sorted_by (str, optional): One of SORT_FIELDS, prefixed with '-' for descending
+            order. Defaults to 'time'.
+        cursor (str, optional): The cursor returned with the previous page.
+        size (int): The number of problems per page.
+
+    Returns:
+        tuple: The list of problems and the cursor of the next page, None on the last page.
+
+    Raises:
+        InvalidSort: If the sort field is not one of SORT_FIELDS.
+        InvalidCursor: If the cursor is malformed.
+    """
+    sorted_by = sorted_by or 'time'
+    field = sorted_by.lstrip('-')
+    if field not in SORT_FIELDS or sorted_by.count('-') > 1:
+        raise InvalidSort(f"Can not sort by {sorted_by}")
+    descending = sorted_by.startswith('-')
+    problems = Problem.objects.filter(user=user).select_related(
+        'topic', 'difficulty').only(*LIST_FIELDS)
+    if cursor:
+        value, pk = decode_cursor(cursor, field)
+        lookup = 'lt' if descending else 'gt'
+        problems = problems.filter(Q(**{f'{field}__{lookup}': value})
+                                   | Q(**{field: value, f'pk__{lookup}': pk}))
+    problems = list(problems.order_by(sorted_by, '-pk' if descending else 'pk')[:size + 1])
+    if len(problems) <= size:
+        return problems, None
+    problems = problems[:size]
+    return problems, encode_cursor(problems[-1], field)
+
+
 def generate_webpage(content, problem, root_path):
     """
     Generate a webpage for a given problem with the provided content.
@@ -1,16 +1,18 @@
 """
 LeetQuizzer application views.
 """
+from django.http import JsonResponse
 from django.shortcuts import render, redirect, get_object_or_404
-from django.urls import reverse_lazy
+from django.urls import reverse, reverse_lazy
+from django.db import IntegrityError, transaction
 from django.db.models import Count
 from django.views import View
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.core.exceptions import FieldError
 from leetquizzer.models import Problem, Topic, Difficulty
 from leetquizzer.forms import CreateProblemForm, CreateTopicForm, UpdateProblemForm
-from leetquizzer.utils.functions import get_question_list
-from leetquizzer.utils.functions import get_problem_info, get_problem_desc
+from leetquizzer.utils.functions import get_question_list, get_problem_page
+from leetquizzer.utils.functions import InvalidCursor, InvalidSort
+from leetquizzer.utils.functions import get_problem_info, get_description, refresh_description
 
 
 class MainMenu(View):
@@ -18,9 +20,10 @@ class MainMenu(View):
     View class for the main menu page.
 
     This class-based view handles the GET request for the main menu page.
-    It retrieves a list of problems from the database and renders the 'leetquizzer/index.html' 
-    template. The list of problems can be sorted based on the specified 'sorted_by' parameter, 
-    which can be 'topic', 'difficulty', or None.
+    It retrieves the first page of problems from the database and renders the 
+    'leetquizzer/index.html' template, the following pages are loaded from ProblemList. 
+    The list of problems can be sorted based on the specified 'sorted_by' parameter, 
+    which can be 'time', 'number', 'topic__name', 'difficulty__name' or None.
     """
     failure_url = 'leetquizzer/base.html'
     template = 'leetquizzer/index.html'
@@ -30,7 +33,8 @@ class MainMenu(View):
         Handle GET request for the main menu page.
 
         Args:
-            sorted_by (str, optional): The sorting parameter. Can be 'topic', 'difficulty', or None.
+            sorted_by (str, optional): The sorting parameter, prefixed with '-' for descending 
+            order. Can be 'time', 'number', 'topic__name', 'difficulty__name' or None.
 
         Returns:
             HttpResponse: The rendered response with the 'leetquizzer/index.html' template and the 
@@ -38,24 +42,61 @@ class MainMenu(View):
 
         Note:
             The 'sorted_by' parameter determines the sorting order of the problem list.
-            If 'sorted_by' is 'topic', the problems are sorted by topic name.
-            If 'sorted_by' is 'difficulty', the problems are sorted by difficulty name.
+            If 'sorted_by' is 'topic__name', the problems are sorted by topic name.
+            If 'sorted_by' is 'difficulty__name', the problems are sorted by difficulty name.
             If 'sorted_by' is None, the problems are sorted by time (default order).
+            Any other value renders the failure template.
         """
         if not request.user.is_authenticated:
             context = {'problem_list': {}}
             return render(request, self.template, context)
         try:
-            if sorted_by:
-                problems = Problem.objects.filter(
-                    user=request.user).order_by(sorted_by)
-            else:
-                problems = Problem.objects.filter(
-                    user=request.user).order_by('time')
-            context = {'problem_list': problems, 'current': sorted_by}
-            return render(request, self.template, context)
-        except FieldError:
+            problems, cursor = get_problem_page(request.user, sorted_by)
+        except ValueError:
             return render(request, self.failure_url)
+        context = {'problem_list': problems, 'current': sorted_by, 'next_cursor': cursor}
+        return render(request, self.template, context)
+
+
+class ProblemList(View):
+    """
+    JSON variant of the main menu problem list, one page at a time.
+
+    The 'sort' query parameter takes the same values as MainMenu's 'sorted_by' and the 
+    'cursor' parameter the 'next' value of the previous page.
+    """
+
+    def get(self, request):
+        """
+        Handle GET request for a page of the problem list.
+
+        Returns:
+            JsonResponse: The problems of the page and the cursor of the next page, 'next' 
+            being null on the last page. Responds with status 403 to anonymous users and 400 
+            to an unknown sort field or malformed cursor.
+        """
+        if not request.user.is_authenticated:
+            return JsonResponse({'error': 'Login required'}, status=403)
+        try:
+            problems, cursor = get_problem_page(request.user, request.GET.get('sort'),
+                                                request.GET.get('cursor'))
+        except InvalidSort:
+            return JsonResponse({'error': 'Invalid sort'}, status=400)
+        except InvalidCursor:
+            return JsonResponse({'error': 'Invalid cursor'}, status=400)
+        problem_list = [{
+            'number': problem.number,
+            'name': problem.name,
+            'link': problem.link,
+            'wrong': problem.wrong,
+            'topic': problem.topic.name,
+            'difficulty': problem.difficulty.name,
+            'url': reverse('leetquizzer:problem_menu', args=[problem.pk]),
+            'topic_url': reverse('leetquizzer:update_topic', args=[problem.topic_id]),
+            'update_url': reverse('leetquizzer:update_problem', args=[problem.pk]),
+            'delete_url': reverse('leetquizzer:delete_problem', args=[problem.pk]),
+        } for problem in problems]
+        return JsonResponse({'problems': problem_list, 'next': cursor})
 
 
 class ProblemMenu(View):
@@ -85,7 +126,7 @@ class ProblemMenu(View):
         question_list = get_question_list(problem)
         context = {'question_list': question_list, 'problem_link': problem.link,
                    'problem_title': f"<h1>{problem.number} - {problem.name}</h1>",
-                   'problem_description': get_problem_desc(problem.link).get('content', {})}
+                   'problem_description': get_description(problem.link)}
         return render(request, self.template, context)
 
     def post(self, request, problem_id):
@@ -116,8 +157,8 @@ class CreateProblem(LoginRequiredMixin, View):
 
     This class-based view handles the GET and POST requests for creating a new problem.
     It renders the 'problem_create.html' template for displaying the form to create a problem.
-    The view performs form validation, checks for existing problems with the same name or number,
-    and saves the new problem to the database if it passes all validations.
+    The view performs form validation and saves the new problem to the database, relying on
+    the unique (user, number) constraint to reject a problem that was already added.
 
     Attributes:
         template (str): The name of the template to render.
@@ -147,11 +188,10 @@ class CreateProblem(LoginRequiredMixin, View):
         Note:
             This method performs form validation by checking if the form is valid.
             If the form is not valid, it re-renders the template with the form and appropriate 
-            error messages. It then checks if a problem with the same name or number already 
-            exists in the database. If a problem with the same name or number exists, it re-renders 
-            the template with the form and an error message. If the form passes all validations, 
-            a new Problem instance is created and saved to the database. The response is redirected 
-            to the success URL.
+            error messages. If the form passes all validations, a new Problem instance is saved to 
+            the database. When the save violates the unique (user, number) constraint, the problem 
+            already exists and the template is re-rendered with the form and an error message. 
+            Otherwise the response is redirected to the success URL.
         """
         form = CreateProblemForm(request.POST, user=request.user)
         if not form.is_valid():
@@ -164,26 +204,26 @@ class CreateProblem(LoginRequiredMixin, View):
             context = {'form': form, 'page_title': 'Create Problem',
                        'message': 'Url not formatted correctly!'}
             return render(request, self.template, context)
-        number = info_dict['questionFrontendId']
-        has_number = Problem.objects.filter(
-            user=request.user).filter(number=number).exists()
-        if has_number:
-            context = {'form': form, 'page_title': 'Create Problem',
-                       'message': 'Problem already exists!'}
-            return render(request, self.template, context)
         difficulty, _ = Difficulty.objects.get_or_create(
             name=info_dict['difficulty'])
         problem = Problem(link=endpoints[-2],
                           user=request.user,
                           difficulty=difficulty,
-                          number=number,
+                          number=info_dict['questionFrontendId'],
                           name=info_dict['title'],
                           topic=form.cleaned_data['topic'],
                           edge_case=form.cleaned_data['edge_case'],
                           solution=form.cleaned_data['solution'],
                           option1=form.cleaned_data['option1'],
                           option2=form.cleaned_data['option2'])
-        problem.save()
+        try:
+            with transaction.atomic():
+                problem.save()
+        except IntegrityError:
+            context = {'form': form, 'page_title': 'Create Problem',
+                       'message': 'Problem already exists!'}
+            return render(request, self.template, context)
+        refresh_description(problem.link)
         return redirect(self.success_url)
 
 
@@ -265,8 +305,8 @@ class CreateTopic(View):
 
     This class-based view handles the GET and POST requests for creating a new topic.
     It renders the 'topic_create.html' template for displaying the form to create a topic.
-    The view performs form validation, checks for existing topics with the same name,
-    and saves the new topic to the database if it passes all validations.
+    The view performs form validation and saves the new topic to the database, relying on
+    the unique (user, name) constraint to reject a topic name that is already taken.
 
     Attributes:
         template (str): The name of the template to render.
@@ -298,10 +338,10 @@ class CreateTopic(View):
         Note:
             This method performs form validation by checking if the form is valid. If the form 
             is not valid, it re-renders the template with the form and appropriate error messages.
-            It then checks if a topic with the same name already exists in the database. If a 
-            topic with the same name exists, it re-renders the template with the form and an 
-            error message. If the form passes all validations, a new Topic instance is created 
-            and saved to the database. The response is redirected to the success URL.
+            If the form passes all validations, a new Topic instance is saved to the database. 
+            When the save violates the unique (user, name) constraint, it re-renders the template 
+            with the form and an error message. Otherwise the response is redirected to the 
+            success URL.
         """
         form = CreateTopicForm(request.POST)
         if not form.is_valid():
@@ -311,16 +351,16 @@ class CreateTopic(View):
                        'form': form, 'topic_list': topics}
             return render(request, self.template, context)
         new_topic = form.cleaned_data['topic'].lower().title()
-        has_topic = Topic.objects.filter(
-            user=request.user).filter(name=new_topic).exists()
-        if has_topic:
+        topic = Topic(name=new_topic, user=request.user)
+        try:
+            with transaction.atomic():
+                topic.save()
+        except IntegrityError:
             topics = Topic.objects.filter(user=request.user).annotate(
                 Count('problem')).values_list('name', 'problem__count')
             context = {'page_title': 'Create Topic', 'form': form, 'topic_list': topics,
                        'message': 'Topic with this name already exists!'}
             return render(request, self.template, context)
-        topic = Topic(name=new_topic, user=request.user)
-        topic.save()
         return redirect(request.GET.get('next', self.success_url))
 
 
@@ -359,15 +399,15 @@ class UpdateTopic(View):
                        'form': form, 'topic_list': topics}
             return render(request, self.template, context)
         new_topic = form.cleaned_data['topic'].lower().title()
-        has_topic = Topic.objects.filter(
-            user=request.user).filter(name=new_topic).exists()
-        if has_topic:
+        topic = get_object_or_404(Topic, pk=topic_id)
+        topic.name = new_topic
+        try:
+            with transaction.atomic():
+                topic.save()
+        except IntegrityError:
             topics = Topic.objects.filter(user=request.user).annotate(
                 Count('problem')).values_list('name', 'problem__count')
             context = {'page_title': 'Update Topic', 'form': form, 'topic_list': topics,
                        'message': 'Topic with this name already exists!'}
             return render(request, self.template, context)
-        topic = get_object_or_404(Topic, pk=topic_id)
-        topic.name = new_topic
-        topic.save()
         return redirect(self.success_url)
@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "website.settings")
 
 application = get_asgi_application()
+
+# Start the chess engine processes now rather than during the first move
+from chess_app.engine import start_pool  # noqa: E402
+
+start_pool()
@@ -42,6 +42,61 @@ EMAIL_USE_SSL = False
 
 # LeetCode url
 LEETCODE_URL = "https://leetcode.com/graphql/"
+# Seconds to wait for LeetCode to respond, and how often a failed query is retried
+LEETCODE_TIMEOUT = env.float('LEETCODE_TIMEOUT', default=5)
+LEETCODE_CONNECT_TIMEOUT = env.float('LEETCODE_CONNECT_TIMEOUT', default=1)
+LEETCODE_RETRIES = env.int('LEETCODE_RETRIES', default=2)
+# After this many failed queries in a row, LeetCode is not queried for the cooldown seconds
+LEETCODE_BREAKER_THRESHOLD = env.int('LEETCODE_BREAKER_THRESHOLD', default=5)
+LEETCODE_BREAKER_COOLDOWN = env.int('LEETCODE_BREAKER_COOLDOWN', default=30)
+# Cached problem descriptions are refreshed in the background after this many seconds
+LEETCODE_DESCRIPTION_TTL = env.int('LEETCODE_DESCRIPTION_TTL', default=7 * 24 * 60 * 60)
+# A description that could not be fetched yet is asked for again after this many seconds
+LEETCODE_RETRY_SECONDS = env.int('LEETCODE_RETRY_SECONDS', default=5 * 60)
+# Number of problems rendered with the problem list and loaded per page afterwards
+LEETQUIZZER_PAGE_SIZE = env.int('LEETQUIZZER_PAGE_SIZE', default=50)
+
+# Chess engine configurations
+# Time budget in milliseconds of each minimax preset the client can pick as its model
+CHESS_SEARCH_BUDGETS = {
+    "minimax": env.int('CHESS_SEARCH_BUDGET_MS', default=1000),
+    "minimax-fast": 250,
+    "minimax-deep": 2500,
+}
+CHESS_MAX_SEARCH_DEPTH = env.int('CHESS_MAX_SEARCH_DEPTH', default=12)
+# Polyglot opening book played before any predictor, built with `manage.py build_book`
+CHESS_BOOK_PATH = "chess_app/models/book.bin"
+CHESS_TRANSPOSITION_TABLE_MB = env.int('CHESS_TRANSPOSITION_TABLE_MB', default=32)
+# AI moves are searched in a process pool, 0 workers searches in a thread instead
+CHESS_ENGINE = {
+    "workers": env.int('CHESS_ENGINE_WORKERS', default=2),
+    "queue_limit": env.int('CHESS_ENGINE_QUEUE_LIMIT', default=8),
+    "deadline_ms": env.int('CHESS_SEARCH_DEADLINE_MS', default=3000),
+}
+# Per-request timings of play_step, logged as JSON lines and optionally sent as Server-Timing
+CHESS_INSTRUMENTATION = {
+    "enabled": env.bool('CHESS_INSTRUMENTATION', default=False),
+    "server_timing": env.bool('CHESS_SERVER_TIMING', default=False),
+}
+# Live games are kept per worker, set a cache alias to share them between workers
+CHESS_GAME_STORE = {
+    "max_games": env.int('CHESS_MAX_GAMES', default=1000),
+    "cache": env('CHESS_GAME_CACHE', default=None),
+    "timeout": 24 * 60 * 60,
+}
+
+# Chess model configurations
+CHESS_MODEL_PATH = "chess_app/models/chess_model.onnx"
+CHESS_WARMUP_MODEL = env.bool('CHESS_WARMUP_MODEL', default=True)
+CHESS_SESSION_OPTIONS = {
+    "intra_op_num_threads": env.int('CHESS_INTRA_OP_THREADS', default=1),
+    "inter_op_num_threads": env.int('CHESS_INTER_OP_THREADS', default=1),
+    "graph_optimization_level": env('CHESS_GRAPH_OPTIMIZATION', default="all"),
+    "optimized_model_path": env('CHESS_OPTIMIZED_MODEL_PATH', default=None),
+}
+# Concurrent predictions arriving within this window share one model call, 0 disables it
+CHESS_BATCH_WINDOW_MS = env.float('CHESS_BATCH_WINDOW_MS', default=0)
+CHESS_BATCH_MAX_SIZE = env.int('CHESS_BATCH_MAX_SIZE', default=16)
 
 # Application definition
 
@@ -150,3 +205,18 @@ STATICFILES_DIRS = [
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
+
+# Logging
+# https://docs.djangoproject.com/en/4.2/topics/logging/
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "chess_app": {"handlers": ["console"], "level": "INFO"},
+        "leetquizzer": {"handlers": ["console"], "level": "WARNING"},
+    },
+}
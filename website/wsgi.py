@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "website.settings")
 
 application = get_wsgi_application()
+
+# Start the chess engine processes now rather than during the first move
+from chess_app.engine import start_pool  # noqa: E402
+
+start_pool()